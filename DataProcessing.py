@@ -5,7 +5,41 @@ import argparse
 import csv
 import shutil
 import os
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from samplelog import read_samples
+from analysis import (analyze_run, column_names, detect_throttling, pooled_stats, ANALYSIS_VERSION,
+                      CLUSTER_FREQ_COLUMNS, CPUFREQ_COOLING_CLUSTERS)
+from result_cache import ResultCache, hash_files
+from benchmarks import BENCHMARKS, BIG_CORES, LITTLE_CORES, cores_of, get_benchmark
+from results_store import ResultsStore
+from perf_counters import COUNTER_NAMES
+
+# Log columns summarised over the benchmark window
+ANALYSIS_COLUMNS = ['power', 'usage_c0', 'usage_c1', 'usage_c2', 'usage_c3',
+                    'usage_c4', 'usage_c5', 'usage_c6', 'usage_c7',
+                    'used_memory', 'free_memory']
+# Big core temperatures and cluster voltages of the default log layout. They come
+# from the 'temps' and 'volts' sysfs groups, which can be disabled or missing on a
+# board; their result columns are None then.
+BIG_CORE_TEMPS = ['temp4', 'temp5', 'temp6', 'temp7']
+CLUSTER_VOLTAGES = ['little_micro_volts', 'big_micro_volts']
+# Summarised too when the log has them (they depend on the enabled sysfs node
+# groups), with the result columns their window means go to
+OPTIONAL_ANALYSIS_COLUMNS = [
+    ('little_core_freq', 'Avg Little Core Freq (kHz)'),
+    ('big_core_freq', 'Avg Big Core Freq (kHz)'),
+    ('temp_gpu', 'Avg GPU Temp (C)'),
+    ('gpu_freq', 'Avg GPU Freq (Hz)'),
+    ('gpu_micro_volts', 'Avg GPU Voltage (µV)'),
+    ('mem_micro_volts', 'Avg Memory Voltage (µV)'),
+]
+# Percentiles of the interval IPC reported per iteration, as (label, percentile)
+IPC_PERCENTILES = [('Min', 0), ('P5', 5), ('Median', 50), ('Max', 100)]
+# Iterations throttled for more than this share of their runtime are flagged
+# 'Throttled' and left out of sweep summaries and fleet comparisons, as are
+# the 'Outlier' iterations run_benchmark.py --converge re-ran
+THROTTLED_MAX_SHARE = 0.02
+FLAG_COLUMNS = ['Throttled', 'Outlier']
 
 def convert_txt_to_csv(input_file, output_file):
     with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
@@ -15,252 +49,498 @@ def convert_txt_to_csv(input_file, output_file):
             outfile.write(csv_line)
 
 
-def process_benchmark_results_tp(log_filename_base, iterations, output_csv_filename):
-    # Function to parse the log file and extract benchmarking data
-    def parse_log_file(filename):
-        operations_data = defaultdict(lambda: {
-            'PAPI instructions': [],
-            'PAPI cycles': [],
-            'IPC': [],
-            'Overall throughput': [],
-            'Operation time': []
-        })
-        current_iteration = None
-        current_operation = None
-
-        with open(log_filename_base, 'r') as file:
-            lines = file.readlines()
-
-            for line in lines:
-                line = line.strip()
-
-                # Check for iteration number
-                if line.startswith('Starting iteration'):
-                    parts = line.split()
-                    current_iteration = int(parts[2])  # Assuming 'Starting iteration X of Y' format
-                    continue
-
-                # Check for operation type after "Doing"
-                if line.startswith('Doing'):
-                    current_operation = line.split('Doing ')[1].strip()
-                    continue
-
-                # Extract data after finding the operation type and iteration number
-                if current_iteration is not None and current_operation is not None:
-                    if line.startswith('PAPI instructions'):
-                        papi_instructions = int(line.split(':')[1].strip())
-                        operations_data[current_operation]['PAPI instructions'].append(papi_instructions)
-                    elif line.startswith('PAPI cycles'):
-                        papi_cycles = int(line.split(':')[1].strip())
-                        operations_data[current_operation]['PAPI cycles'].append(papi_cycles)
-                    elif line.startswith('IPC'):
-                        ipc = float(line.split(':')[1].strip())
-                        operations_data[current_operation]['IPC'].append(ipc)
-                    elif line.startswith('Overall throughput'):
-                        # Extract numeric value using regular expression
-                        overall_throughput_match = re.search(r'\d+(?:\.\d+)?(?:[eE][+-]?\d+)?', line)
-                        if overall_throughput_match:
-                            overall_throughput = float(overall_throughput_match.group())
-                            operations_data[current_operation]['Overall throughput'].append(overall_throughput)
-                    elif line.startswith('Performed'):
-                        # Extract operation time using regular expression
-                        operation_time_match = re.search(r'(\d+\.\d+) seconds', line)
-                        if operation_time_match:
-                            operation_time = float(operation_time_match.group(1))
-                            operations_data[current_operation]['Operation time'].append(operation_time)
-
-        return operations_data
-
-    # Function to compute averages across all iterations for each operation
-    def compute_averages_for_operations(log_filename_base, iterations):
-        operations_data = defaultdict(lambda: {
-            'PAPI instructions': [],
-            'PAPI cycles': [],
-            'IPC': [],
-            'Overall throughput': [],
-            'Operation time': []
-        })
-
-        for iteration in range(iterations):
-            filename = f'{log_filename_base}_{iteration}.txt'
-            iteration_data = parse_log_file(filename)
-
-            for op, data in iteration_data.items():
-                if data['PAPI instructions']:
-                    operations_data[op]['PAPI instructions'].extend(data['PAPI instructions'])
-                if data['PAPI cycles']:
-                    operations_data[op]['PAPI cycles'].extend(data['PAPI cycles'])
-                if data['IPC']:
-                    operations_data[op]['IPC'].extend(data['IPC'])
-                if data['Overall throughput']:
-                    operations_data[op]['Overall throughput'].extend(data['Overall throughput'])
-                if data['Operation time']:
-                    operations_data[op]['Operation time'].extend(data['Operation time'])
-
-        # Calculate averages for each operation type
-        averaged_data = {}
-        for op, data in operations_data.items():
-            averaged_data[f'Avg PAPI instructions ({op})'] = (
-                sum(data['PAPI instructions']) / len(data['PAPI instructions'])
-                if data['PAPI instructions'] else None
-            )
-            averaged_data[f'Avg PAPI cycles ({op})'] = (
-                sum(data['PAPI cycles']) / len(data['PAPI cycles'])
-                if data['PAPI cycles'] else None
-            )
-            averaged_data[f'Avg IPC ({op})'] = (
-                sum(data['IPC']) / len(data['IPC'])
-                if data['IPC'] else None
-            )
-            averaged_data[f'Avg Overall throughput ({op})'] = (
-                sum(data['Overall throughput']) / len(data['Overall throughput'])
-                if data['Overall throughput'] else None
-            )
-            averaged_data[f'Avg Operation time ({op})'] = (
-                sum(data['Operation time']) / len(data['Operation time'])
-                if data['Operation time'] else None
-            )
-
-        return averaged_data
-
-    # Function to write the result to a CSV file
-    def write_to_csv(data, csv_filename):
-        fieldnames = sorted(data.keys())
-        with open(csv_filename, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerow(data)
-
-    # Compute averages for operations
-    averages_result = compute_averages_for_operations(log_filename_base, iterations)
+def process_benchmark_results(benchmark, log_filename_base, iterations, output_csv_filename=None):
+    """
+    Average the metrics the benchmark reports over all iterations in the log
+    (for TPBench, per operation). iterations is kept for the callers' sake.
+    """
+    averages_result = get_benchmark(benchmark).averages(log_filename_base)
 
     # Write result to CSV
-    write_to_csv(averages_result, output_csv_filename)
-
-    print(f"Averages for each benchmark operation have been written to '{output_csv_filename}'.")
-
-
-parser = argparse.ArgumentParser(description='ECE361E HW2 - benchmark_run')  
-parser.add_argument('--logname', type=str, default="exp1", help='base name for the log file')         
-parser.add_argument('--benchmark', type=str, default="tp", help='which benchmark to run')
-parser.add_argument('--devicenumber', type=str, default="mc1_08", help='which benchmark to run')
-parser.add_argument('--iterations', type=int, default=3, help='number of iterations to run the benchmark') 
-args = parser.parse_args()
-logname_base = args.logname
-benchmark = args.benchmark
-device_number = args.devicenumber
-iterations = args.iterations
+    if output_csv_filename is not None and averages_result:
+        fieldnames = sorted(averages_result.keys())
+        with open(output_csv_filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerow(averages_result)
+        print(f"Averages for each benchmark operation have been written to '{output_csv_filename}'.")
+    return averages_result
+
+
+def add_benchmark_metrics(rows, benchmark, log_filename):
+    """
+    Add the per-iteration metrics parsed from the benchmark output to the result rows.
+    Without a ROI time in the output, throughput falls back to the measured runtime.
+    """
+    definition = get_benchmark(benchmark)
+    metrics = definition.iteration_metrics(log_filename)
+    for row in rows:
+        row.update(dict.fromkeys(definition.metric_columns))
+        row.update(metrics.get(row['Iteration'], {}))
+        work = row.get(definition.work_column) if definition.work_column else None
+        if row.get('Throughput (ops/s)') is None and work and row['Runtime (s)']:
+            row['Throughput (ops/s)'] = work / row['Runtime (s)']
+        ratio = row.get('Freq Ratio')
+        row['Throttle-Adjusted Throughput (ops/s)'] = row['Throughput (ops/s)'] / ratio \
+            if row.get('Throughput (ops/s)') is not None and ratio else None
+    return rows
+
+
+# Columns identifying the operating point of a DVFS sweep and the cores of a placement sweep
+FREQUENCY_COLUMNS = ['Big Cluster Freq (kHz)', 'Little Cluster Freq (kHz)']
+PLACEMENT_COLUMNS = ['Affinity Mask', 'Threads']
+
+
+def exclude_flagged(df):
+    """
+    df without the iterations flagged in FLAG_COLUMNS, reporting how many were dropped.
+    """
+    for column in FLAG_COLUMNS:
+        if column not in df.columns:
+            continue
+        flagged = df[column].fillna(False).astype(bool)
+        if flagged.any():
+            print(f"Leaving out {int(flagged.sum())} iterations flagged '{column}'.")
+        df = df[~flagged]
+    return df
+
+
+def _tagged_columns(df, columns):
+    return [c for c in columns if c in df.columns and df[c].notna().any()]
+
+
+def _point_summary(df, keys):
+    # Means over the iterations (and devices) of every sweep point
+    grouped = df.groupby(keys, dropna=False)
+    summary = grouped.agg(**{
+        'Iterations': ('Runtime (s)', 'size'),
+        'Runtime (s)': ('Runtime (s)', 'mean'),
+        'Std Runtime (s)': ('Runtime (s)', 'std'),
+        'Avg Power (W)': ('Avg Power (W)', 'mean'),
+        'Energy (J)': ('Energy (J)', 'mean'),
+        'Std Energy (J)': ('Energy (J)', 'std'),
+    })
+    # Benchmark runs per second per watt, i.e. runs per joule
+    summary['Performance per Watt (1/J)'] = 1 / (summary['Runtime (s)'] * summary['Avg Power (W)'])
+    if 'Throughput (ops/s)' in df.columns and df['Throughput (ops/s)'].notna().any():
+        summary['Throughput (ops/s)'] = grouped['Throughput (ops/s)'].mean()
+        summary['Throughput per Watt (ops/J)'] = summary['Throughput (ops/s)'] / summary['Avg Power (W)']
+        summary['Energy per Operation (nJ)'] = 1e9 / summary['Throughput per Watt (ops/J)']
+    if 'Avg Placement Usage (%)' in df.columns:
+        summary['Avg Placement Usage (%)'] = grouped['Avg Placement Usage (%)'].mean()
+    return summary.reset_index()
+
+
+def frequency_sweep_summary(results):
+    """
+    Mean runtime, power and energy per benchmark and frequency point (and placement,
+    if the run swept those too), pooled over iterations and devices, with
+    performance per watt and, for benchmarks that report a throughput, throughput
+    per watt and energy per operation. Throttled and outlier iterations are left out.
+    """
+    df = exclude_flagged(pd.DataFrame(results).dropna(subset=FREQUENCY_COLUMNS))
+    if df.empty:
+        return df
+    keys = (['Benchmark'] if 'Benchmark' in df.columns else []) + FREQUENCY_COLUMNS
+    return _point_summary(df, keys + _tagged_columns(df, PLACEMENT_COLUMNS))
+
+
+def describe_placement(mask):
+    """
+    '2 big + 2 LITTLE' style description of the cores in an affinity mask.
+    """
+    cores = cores_of(int(mask))
+    parts = [f"{n} {kind}" for n, kind in ((sum(c in BIG_CORES for c in cores), 'big'),
+                                           (sum(c in LITTLE_CORES for c in cores), 'LITTLE')) if n]
+    return ' + '.join(parts)
+
+
+def placement_scaling_summary(results, reference=None):
+    """
+    Scaling table of a placement sweep: mean runtime, power and energy per
+    benchmark (and frequency point) and placement, with the speedup over the
+    reference placement and the parallel efficiency speedup / (threads / reference threads).
+    reference is an affinity mask; by default the placement with the fewest
+    threads, big cores first. Throttled and outlier iterations are left out.
+    """
+    df = exclude_flagged(pd.DataFrame(results).dropna(subset=PLACEMENT_COLUMNS))
+    if df.empty:
+        return df
+    groups = (['Benchmark'] if 'Benchmark' in df.columns else []) + _tagged_columns(df, FREQUENCY_COLUMNS)
+    summary = _point_summary(df, groups + PLACEMENT_COLUMNS)
+    summary['Cores'] = summary['Affinity Mask'].map(describe_placement)
+
+    tables = []
+    for _, table in (summary.groupby(groups, dropna=False) if groups else [(None, summary)]):
+        table = table.copy()
+        if reference is not None and (table['Affinity Mask'] == reference).any():
+            ref = table[table['Affinity Mask'] == reference].sort_values('Threads').iloc[0]
+        else:
+            big_first = table['Affinity Mask'].map(lambda mask: not any(c in BIG_CORES for c in cores_of(int(mask))))
+            ref = table.assign(_little=big_first).sort_values(['Threads', '_little']).iloc[0]
+        table['Speedup'] = ref['Runtime (s)'] / table['Runtime (s)']
+        table['Efficiency'] = table['Speedup'] / (table['Threads'] / ref['Threads'])
+        table['Energy Ratio'] = table['Energy (J)'] / ref['Energy (J)']
+        tables.append(table)
+    summary = pd.concat(tables, ignore_index=True)
+    summary['Affinity Mask'] = summary['Affinity Mask'].map(lambda mask: f'{int(mask):#x}')
+    return summary
+
+
+def write_sweep_summary(results, output_csv):
+    summary = frequency_sweep_summary(results)
+    if summary.empty:
+        print("No frequency-tagged iterations found; no sweep summary written.")
+        return
+    summary.to_csv(output_csv, index=False)
+    print(f"Summary of {len(summary)} frequency points written to '{output_csv}'.")
+
+
+def write_scaling_summary(results, output_csv, reference=None):
+    summary = placement_scaling_summary(results, reference)
+    if summary.empty:
+        print("No placement-tagged iterations found; no scaling table written.")
+        return
+    summary.to_csv(output_csv, index=False)
+    print(f"Scaling table of {len(summary)} placements written to '{output_csv}'.")
+
+
+# Directory name written by organize_files: {logname}_{device}_{benchmark}_{iterations},
+# with device numbers like mc1_08. The iteration count is only a label: convergence
+# mode and sweeps run a different number of iterations, see find_iterations.
+RUN_DIR_PATTERN = re.compile(r'^(?P<logname>.+)_(?P<device>[A-Za-z0-9]+_\d+)_(?P<benchmark>[A-Za-z0-9]+)_(?P<iterations>\d+)$')
+
+
+def iteration_files(directory, logname_base, benchmark, i):
+    """
+    Paths of the raw files of one iteration inside directory.
+    """
+    base = os.path.join(directory, f'{logname_base}_{i}_{benchmark.replace("/", "_")}')
+    return {
+        'txt': base + '.txt',
+        'csv': base + '.csv',
+        'bin': base + '.bin',
+        'power': base + '_power.bin',
+        'time': base + '_time.txt',
+        'cooldown': base + '_cooldown.txt',
+        'stats': base + '_stats.json',
+    }
+
+
+def find_iterations(directory, logname_base, benchmark):
+    """
+    Numbers of the iterations that ran in directory, in order, from the time
+    files run_benchmark.py writes at the end of every iteration.
+    """
+    pattern = re.compile(rf'^{re.escape(logname_base)}_(\d+)_{re.escape(benchmark.replace("/", "_"))}_time\.txt$')
+    return sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(directory or '.')) if match)
+
+
+def read_benchmark_window(time_file):
+    """
+    Start and end timestamps written by run_benchmark.py.
+    """
+    with open(time_file, 'r') as file:
+        content = file.read()
+
+    # Use regular expressions to extract start and end times
+    start_match = re.search(r'Start_time:\s*(\d+\.\d+)', content)
+    end_match = re.search(r'End time:\s*(\d+\.\d+)', content)
+
+    # Extract timestamps from the matches
+    return float(start_match.group(1)), float(end_match.group(1))
+
+
+def read_iteration_tags(time_file):
+    """
+    Operating point and placement the iteration ran with, as a dict with big_freq,
+    little_freq (khz), affinity and threads, and whether --converge rejected it as
+    an outlier. Tags that older logs lack are None.
+    """
+    with open(time_file, 'r') as file:
+        content = file.read()
+    tags = {}
+    for key, label in (('big_freq', 'Big_freq'), ('little_freq', 'Little_freq'),
+                       ('affinity', 'Affinity'), ('threads', 'Threads'), ('outlier', 'Outlier')):
+        match = re.search(label + r':\s*(0x[0-9a-fA-F]+|\d+)', content)
+        tags[key] = int(match.group(1), 0) if match else None
+    return tags
+
+
+def process_iteration(directory, logname_base, benchmark, i, convert_csv=True, baseline_window=None):
+    """
+    Compute the measurement metrics of one iteration. Returns one result row.
+    baseline_window limits the guard band seconds the idle baseline is taken from.
+    """
+    files = iteration_files(directory, logname_base, benchmark, i)
+
+    meta = {}  # only binary logs have a header
+    if os.path.isfile(files['bin']):
+        # Binary logs map straight into a structured array
+        log, meta = read_samples(files['bin'])
+    elif os.path.isfile(files['txt']):
+        if convert_csv:
+            # Convert the text file to a CSV file
+            convert_txt_to_csv(files['txt'], files['csv'])
+        # Read the log file
+        log = pd.read_csv(files['txt'], sep=r'\s+')
+    else:
+        # Already organized runs only keep the converted CSV
+        log = pd.read_csv(files['csv'])
+
+    start_timestamp, end_timestamp = read_benchmark_window(files['time'])
+    tags = read_iteration_tags(files['time'])
+
+    # Power meter stream, when it was recorded alongside the log
+    meter = read_samples(files['power'])[0] if os.path.isfile(files['power']) else None
+
+    # Window, energy and all column statistics in one pass
+    present = set(column_names(log))
+    columns = ANALYSIS_COLUMNS + [c for c in BIG_CORE_TEMPS + CLUSTER_VOLTAGES if c in present] \
+        + [c for c, _ in OPTIONAL_ANALYSIS_COLUMNS if c in present]
+    run = analyze_run(log, start_timestamp, end_timestamp, columns=columns, meter=meter,
+                      counters=COUNTER_NAMES, baseline_window=baseline_window)
+    stats = run['stats']
+    temps = [c for c in BIG_CORE_TEMPS if c in present]
+    avg_temp, std_temp = pooled_stats(stats, temps) if temps else (None, None)
+    avg_p = stats.at['power', 'mean']
+    # Usage of the cores the benchmark was pinned to; all cores for untagged logs
+    cores = cores_of(tags['affinity']) if tags['affinity'] else list(range(8))
+    core_usage = {f'Avg Usage Core {c} (%)': stats.at[f'usage_c{c}', 'mean'] * 100 if c in cores else None
+                  for c in range(8)}
+    std_p = stats.at['power', 'std']
+
+    # Hardware counters of the benchmark process, when they were available
+    counts = run['counters']
+    instructions, cycles = counts.get('instructions'), counts.get('cycles')
+    kilo_instructions = instructions / 1000 if instructions else None
+    counter_metrics = {
+        'Instructions': instructions,
+        'Cycles': cycles,
+        'Cache Misses': counts.get('cache_misses'),
+        'Branch Misses': counts.get('branch_misses'),
+        'IPC': instructions / cycles if instructions is not None and cycles else None,
+        'Cache MPKI': counts['cache_misses'] / kilo_instructions
+        if kilo_instructions and counts.get('cache_misses') is not None else None,
+        'Branch MPKI': counts['branch_misses'] / kilo_instructions
+        if kilo_instructions and counts.get('branch_misses') is not None else None,
+    }
+    # Spread of the IPC over the sampling intervals, phases of the benchmark included
+    ipc = run['ipc'][np.isfinite(run['ipc'])]
+    counter_metrics.update({f'{label} IPC': float(np.percentile(ipc, q)) if len(ipc) else None
+                            for label, q in IPC_PERCENTILES})
+
+    # Energy above the board's own idle power, which differs between units
+    baseline = run['baseline']
+    baseline_metrics = {
+        'Idle Power (W)': baseline['idle_power'],
+        'Idle Power CI (W)': baseline['idle_power_ci'],
+        'Idle Samples': baseline['idle_samples'],
+        'Static Energy (J)': baseline['static_energy'],
+        'Dynamic Power (W)': baseline['dynamic_power'],
+        'Dynamic Energy (J)': baseline['dynamic_energy'],
+        'Dynamic Energy CI (J)': baseline['energy_ci'],
+    }
+
+    # Throttling of the clusters the benchmark ran on, against the frequencies it was set to
+    clusters = [name for name, members in (('big', BIG_CORES), ('little', LITTLE_CORES))
+                if any(c in members for c in cores)]
+    throttle = detect_throttling(log, start_timestamp, end_timestamp, clusters=clusters, meter=meter,
+                                 expected_freqs={'big': tags['big_freq'], 'little': tags['little_freq']},
+                                 cooling_devices=meta.get('cooling_devices'))
+    ratio = throttle['freq_ratio']
+    # What the iteration would have taken at the expected frequencies, assuming
+    # its runtime scales with the clock, and the energy at the unthrottled power
+    adjusted_runtime = run['runtime'] * ratio if ratio else None
+    throttle_metrics = {
+        'Throttled': throttle['throttled_share'] > THROTTLED_MAX_SHARE,
+        'Throttled Share (%)': throttle['throttled_share'] * 100,
+        'Temp Over Threshold Share (%)': throttle['temp_share'] * 100,
+        'Power Plateau Share (%)': throttle['plateau_share'] * 100,
+        'Throttle Events': throttle['events'],
+        'Throttle Intervals': '; '.join(f'{t0:.2f}-{t1:.2f} s {kind}' for t0, t1, kind in throttle['intervals']),
+        # Fans and GPU cooling, which do not throttle the benchmark's cores
+        'Other Cooling Active': '; '.join(f'{device} {active:.0%}'
+                                          for device, active in throttle['other_cooling'].items()),
+        'Freq Ratio': ratio,
+        'Throttle-Adjusted Runtime (s)': adjusted_runtime,
+        'Throttle-Adjusted Energy (J)': throttle['steady_power'] * adjusted_runtime
+        if adjusted_runtime and throttle['steady_power'] is not None else None,
+    }
+
+    return {
+        'Iteration': i,
+        'Big Cluster Freq (kHz)': tags['big_freq'],
+        'Little Cluster Freq (kHz)': tags['little_freq'],
+        'Affinity Mask': tags['affinity'],
+        'Threads': tags['threads'],
+        'Outlier': bool(tags['outlier']),
+        'Runtime (s)': run['runtime'],
+        'Avg Power (W)': avg_p,
+        'Avg Temp (C)': avg_temp,
+        'Energy (J)': run['energy'],
+        **baseline_metrics,
+        'Max Energy (J)': stats.at['energy', 'max'],
+        'Min Energy (J)': stats.at['energy', 'min'],
+        'Median Energy (J)': stats.at['energy', 'median'],
+        'Avg Little Cluster Voltage (µV)': stats.at['little_micro_volts', 'mean'] if 'little_micro_volts' in present else None,
+        'Avg Big Cluster Voltage (µV)': stats.at['big_micro_volts', 'mean'] if 'big_micro_volts' in present else None,
+        'Std Power (W)': std_p,
+        'Std Power (%)': (std_p / avg_p) * 100 if avg_p != 0 else 0,
+        'Std Temp (C)': std_temp,
+        'Std Temp (%)': None if avg_temp is None else (std_temp / avg_temp) * 100 if avg_temp != 0 else 0,
+        'Max Power (W)': stats.at['power', 'max'],
+        'Min Power (W)': stats.at['power', 'min'],
+        'Median Power (W)': stats.at['power', 'median'],
+        'Avg Free Memory (MB)': stats.at['free_memory', 'mean'],
+        'Avg Used Memory (MB)': stats.at['used_memory', 'mean'],
+        'Std Free Memory (MB)': stats.at['free_memory', 'std'],
+        'Std Used Memory (MB)': stats.at['used_memory', 'std'],
+        **core_usage,
+        **{label: stats.at[column, 'mean'] if column in present else None
+           for column, label in OPTIONAL_ANALYSIS_COLUMNS},
+        **counter_metrics,
+        **throttle_metrics,
+        'Avg Placement Usage (%)': np.mean([stats.at[f'usage_c{c}', 'mean'] for c in cores]) * 100
+        if tags['affinity'] else None,
+    }
+
+
+def rawdata_process(logname_base, benchmark, directory='.', baseline_window=None):
+    """
+    Measurement metrics for every iteration of one device found in directory,
+    in iteration order.
+    """
+    return [process_iteration(directory, logname_base, benchmark, i, baseline_window=baseline_window)
+            for i in find_iterations(directory, logname_base, benchmark)]
+
+
+def find_run_directories(root, logname_base=None, benchmark=None):
+    """
+    Run directories under root, as dicts with the fields of RUN_DIR_PATTERN and
+    the numbers of the iterations found in them.
+    """
+    runs = []
+    for dirpath, dirnames, _ in os.walk(root):
+        for name in sorted(dirnames):
+            match = RUN_DIR_PATTERN.match(name)
+            if not match:
+                continue
+            run = match.groupdict()
+            run['iterations'] = int(run['iterations'])
+            run['directory'] = os.path.join(dirpath, name)
+            if logname_base is not None and run['logname'] != logname_base:
+                continue
+            if benchmark is not None and run['benchmark'] != benchmark:
+                continue
+            run['iteration_numbers'] = find_iterations(run['directory'], run['logname'], run['benchmark'])
+            runs.append(run)
+    return runs
+
+
+def _cache_version(baseline_window=None):
+    # Everything besides the raw files a row depends on: the analysis version, the
+    # columns, percentiles and thresholds set here, the throttling defaults and
+    # cluster maps of analysis.py, the core layout and the baseline window. Code
+    # changes to how rows are computed still need an ANALYSIS_VERSION bump.
+    settings = (ANALYSIS_COLUMNS, BIG_CORE_TEMPS, CLUSTER_VOLTAGES, OPTIONAL_ANALYSIS_COLUMNS, IPC_PERCENTILES,
+                THROTTLED_MAX_SHARE, FLAG_COLUMNS, COUNTER_NAMES, detect_throttling.__defaults__,
+                CLUSTER_FREQ_COLUMNS, CPUFREQ_COOLING_CLUSTERS, BIG_CORES, LITTLE_CORES)
+    return f'{ANALYSIS_VERSION}:{settings!r}:baseline={baseline_window}'
+
+
+def _process_tree_task(run, i, cache_dir=None, baseline_window=None):
+    # Worker entry point; raw files are only read, never converted or moved.
+    # Returns (row, cache hit). Only the metrics are cached, since identical
+    # files may belong to different run directories.
+    files = iteration_files(run['directory'], run['logname'], run['benchmark'], i)
+    metrics = None
+    if cache_dir is not None:
+        cache = ResultCache(cache_dir)
+        key = hash_files([files[k] for k in ('bin', 'txt', 'csv', 'power', 'time')], _cache_version(baseline_window))
+        metrics = cache.get(key)
+    hit = metrics is not None
+    if not hit:
+        metrics = process_iteration(run['directory'], run['logname'], run['benchmark'], i, convert_csv=False,
+                                    baseline_window=baseline_window)
+        if cache_dir is not None:
+            cache.put(key, metrics)
+    row = {'Device': run['device'], 'Logname': run['logname'], 'Benchmark': run['benchmark'],
+           'Directory': run['directory'], **metrics}
+    return row, hit
+
+
+def process_tree(root, logname_base=None, benchmark=None, workers=None, cache_dir=None,
+                 cache_max_bytes=256 * 1024 * 1024, baseline_window=None):
+    """
+    Process every (device, iteration) pair found under root in parallel and
+    merge the rows into one fleet-wide DataFrame. Iterations whose files are
+    missing or unreadable are reported and skipped.
+
+    With cache_dir, rows are cached by the content hash of their raw files, the
+    analysis version and the settings rows depend on (see _cache_version), so
+    only new or changed iterations are recomputed.
+    """
+    runs = find_run_directories(root, logname_base, benchmark)
+    rows = []
+    hits = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_process_tree_task, run, i, cache_dir, baseline_window): (run, i)
+                   for run in runs for i in run['iteration_numbers']}
+        for future in as_completed(futures):
+            run, i = futures[future]
+            try:
+                row, hit = future.result()
+            except (OSError, ValueError, KeyError, IndexError, AttributeError) as e:
+                print(f"Skipping {run['directory']} iteration {i}: {e}")
+                continue
+            rows.append(row)
+            hits += hit
+    if cache_dir is not None:
+        evicted = ResultCache(cache_dir, cache_max_bytes).prune()
+        print(f"Result cache: {hits} of {len(rows)} iterations reused, {evicted} entries evicted.")
+
+    return _merge_runs(rows, runs)
+
+
+def process_run_directory(directory, cache_dir=None, baseline_window=None):
+    """
+    Process all iterations of a single run directory, sequentially. Returns the
+    rows as a DataFrame in the same layout as process_tree.
+    """
+    match = RUN_DIR_PATTERN.match(os.path.basename(os.path.normpath(directory)))
+    if not match:
+        raise ValueError(f"{directory} is not a {{logname}}_{{device}}_{{benchmark}}_{{iterations}} directory")
+    run = match.groupdict()
+    run['iterations'] = int(run['iterations'])
+    run['directory'] = directory
+    run['iteration_numbers'] = find_iterations(directory, run['logname'], run['benchmark'])
+    rows = [_process_tree_task(run, i, cache_dir, baseline_window)[0] for i in run['iteration_numbers']]
+    return _merge_runs(rows, [run])
+
+
+def _merge_runs(rows, runs):
+    fleet = pd.DataFrame(rows)
+    if fleet.empty:
+        return fleet
+
+    # Benchmark averages of each device, as in the combined results, and the
+    # metrics the benchmark reported for every iteration
+    merged = []
+    for run in runs:
+        rows_of_run = fleet[fleet['Directory'] == run['directory']].to_dict('records')
+        results_file = os.path.join(run['directory'], 'results.txt')
+        if run['benchmark'] in BENCHMARKS and os.path.isfile(results_file):
+            averages = process_benchmark_results(run['benchmark'], results_file, run['iterations'])
+            add_benchmark_metrics(rows_of_run, run['benchmark'], results_file)
+            for row in rows_of_run:
+                row.update(averages)
+        merged.extend(rows_of_run)
+    fleet = pd.DataFrame(merged)
+
+    return fleet.sort_values(['Logname', 'Benchmark', 'Device', 'Iteration']).reset_index(drop=True)
 
-# List to store results for all iterations
-results = []
-def rawdata_process():
-    for i in range(iterations):
-            file_name = f'{logname_base}_{i}_{benchmark.replace("/", "_")}.txt'
-            output_file_name = f'{logname_base}_{i}_{benchmark.replace("/", "_")}.csv'
 
-            # Convert the text file to a CSV file
-            convert_txt_to_csv(file_name, output_file_name)
-
-            time_find = f'{logname_base}_{i}_{benchmark.replace("/", "_")}_time.txt'
-            with open(time_find, 'r') as file:
-                content = file.read()
-
-            # Use regular expressions to extract start and end times
-            start_match = re.search(r'Start_time:\s*(\d+\.\d+)', content)
-            end_match = re.search(r'End time:\s*(\d+\.\d+)', content)
-
-            # Extract timestamps from the matches
-            start_timestamp = float(start_match.group(1))
-            end_timestamp = float(end_match.group(1))
-
-            # Read the log file
-            log = pd.read_csv(file_name, delim_whitespace=True)
-
-            # Calculate start and end indices for benchmark data
-            time = log['time'].to_numpy()
-            bench_start = start_timestamp - time[0]
-            bench_end = end_timestamp - time[0]
-            start_idx = (time - time[0] < bench_start).nonzero()[0][-1]  # first time before bench start
-            end_idx = (time - time[0] > bench_end).nonzero()[0][1]  # first time after bench end
-
-            # Extract relevant columns
-            w = log['power'].to_numpy()
-            usage4 = log['usage_c4'].to_numpy()
-            usage5 = log['usage_c5'].to_numpy()
-            usage6 = log['usage_c6'].to_numpy()
-            usage7 = log['usage_c7'].to_numpy()
-            temp4 = log['temp4'].to_numpy()
-            temp5 = log['temp5'].to_numpy()
-            temp6 = log['temp6'].to_numpy()
-            temp7 = log['temp7'].to_numpy()
-            free_memory = log['free_memory'].to_numpy()
-            used_memory = log['used_memory'].to_numpy()
-
-            # Combine all temperature readings into one array and calculate average temperature
-            all_temps = np.array([temp4, temp5, temp6, temp7])
-            avg_temp = np.mean(all_temps)
-            
-            # Calculate power and energy when the benchmark is running
-            w_active = w[start_idx:end_idx]
-            energy = np.zeros(len(w_active))
-            energy[0] = 0
-            for j in range(1, len(energy)):
-                energy[j] = energy[j - 1] + 0.2 * w_active[j - 1]
-
-            # Calculate average little and big cluster voltages
-            little_volts_active = log['little_micro_volts'].to_numpy()[start_idx:end_idx]
-            big_volts_active = log['big_micro_volts'].to_numpy()[start_idx:end_idx]
-            avg_little_volts = np.average(little_volts_active)
-            avg_big_volts = np.average(big_volts_active)
-
-            # Calculate runtime and average power
-            runtime = bench_end - bench_start
-            avg_p = np.average(w_active)
-
-            # Calculate average and standard deviation for memory usage
-            avg_free_memory = np.average(free_memory[start_idx:end_idx])
-            avg_used_memory = np.average(used_memory[start_idx:end_idx])
-            std_free_memory = np.std(free_memory[start_idx:end_idx])
-            std_used_memory = np.std(used_memory[start_idx:end_idx])
-
-            # Calculate standard deviation and standard deviation percentage for power and temperature
-            std_p = np.std(w_active)
-            std_p_percent = (std_p / avg_p) * 100 if avg_p != 0 else 0
-            std_temp = np.std(all_temps)
-            std_temp_percent = (std_temp / avg_temp) * 100 if avg_temp != 0 else 0
-
-            # Calculate max, min, and median for energy and power
-            max_energy = np.max(energy)
-            min_energy = np.min(energy)
-            median_energy = np.median(energy)
-            max_power = np.max(w_active)
-            min_power = np.min(w_active)
-            median_power = np.median(w_active)
-
-            # Append results to list
-            results.append({
-                'Iteration': i,
-                'Runtime (s)': runtime,
-                'Avg Power (W)': avg_p,
-                'Avg Temp (C)': avg_temp,
-                'Energy (J)': energy[-1],
-                'Max Energy (J)': max_energy,
-                'Min Energy (J)': min_energy,
-                'Median Energy (J)': median_energy,
-                'Avg Little Cluster Voltage (µV)': avg_little_volts,
-                'Avg Big Cluster Voltage (µV)': avg_big_volts,
-                'Std Power (W)': std_p,
-                'Std Power (%)': std_p_percent,
-                'Std Temp (C)': std_temp,
-                'Std Temp (%)': std_temp_percent,
-                'Max Power (W)': max_power,
-                'Min Power (W)': min_power,
-                'Median Power (W)': median_power,
-                'Avg Free Memory (MB)': avg_free_memory,
-                'Avg Used Memory (MB)': avg_used_memory,
-                'Std Free Memory (MB)': std_free_memory,
-                'Std Used Memory (MB)': std_used_memory
-            })
 def concatenate_averages_to_all_results(all_results_csv, averages_csv, output_csv):
     # Read the CSV files
     all_results_df = pd.read_csv(all_results_csv)
@@ -284,10 +564,8 @@ def concatenate_averages_to_all_results(all_results_csv, averages_csv, output_cs
 
     print(f"Combined results written to '{output_csv}'.")
 
-def organize_files(logname_base, device_number, benchmark, iterations, measurement_results_csv, benchmark_results_csv, combined_results_csv):
-    # Define the base directory
-    base_dir = r'C:\Users\13462\Downloads\HW2'
-    
+def organize_files(logname_base, device_number, benchmark, iterations, measurement_results_csv, benchmark_results_csv, combined_results_csv,
+                   base_dir=r'C:\Users\13462\Downloads\HW2'):
     # Define the target directory
     target_dir = os.path.join(base_dir, f'{logname_base}_{device_number}_{benchmark}_{iterations}')
     
@@ -296,11 +574,12 @@ def organize_files(logname_base, device_number, benchmark, iterations, measureme
         os.makedirs(target_dir)
     
     # Define the file names based on iterations
-    for i in range(iterations):
+    for i in find_iterations('', logname_base, benchmark):
         # Move each exp1_i_top.txt file
-        source_file = f'{logname_base}_{i}_{benchmark.replace("/", "_")}.csv'
-        if os.path.isfile(source_file):
-            shutil.move(source_file, os.path.join(target_dir, source_file))
+        # Raw logs and time files move too, so the run can be reprocessed from the directory
+        for source_file in iteration_files('', logname_base, benchmark, i).values():
+            if os.path.isfile(source_file):
+                shutil.move(source_file, os.path.join(target_dir, source_file))
     
     # Define additional files to move
     for file in [measurement_results_csv, benchmark_results_csv, combined_results_csv]:
@@ -312,25 +591,100 @@ def organize_files(logname_base, device_number, benchmark, iterations, measureme
         shutil.move(results_file, os.path.join(target_dir, results_file))
     print(f"Files have been organized into '{target_dir}'.")
 
-# Paths to the CSV files
-output_csv = f'{logname_base}_{benchmark.replace("/", "_")}_combined_results.csv'
-
-# Run the function
-
-# Write all results to a CSV file
-rawdata_process()
-output_csv_file = f'{logname_base}_{benchmark.replace("/", "_")}_measurment_results.csv'
-pd.DataFrame(results).to_csv(output_csv_file, index=False)
-
-log_filename = 'results.txt'  # Replace with your actual log file name
-output_csv_filename = 'benchmark_results.csv'
-if(benchmark == 'tp'):
-    process_benchmark_results_tp(log_filename, iterations, output_csv_filename)
-elif benchmark == "bs":  # blackscholes
-    print("Unknown benchmark specified.")        
-elif benchmark == "bt":  # bodytrack
-    print("Unknown benchmark specified.")
-concatenate_averages_to_all_results(output_csv_file, output_csv_filename, output_csv)
-organize_files(logname_base, device_number, benchmark, iterations, output_csv_file, output_csv_filename, output_csv)
-print(f"\nAll results written")
-
+def process_device(logname_base, benchmark, device_number, iterations, base_dir, store_dir=None, write_csv=True,
+                   sweep_summary_csv=None, scaling_table_csv=None, reference=None, baseline_window=None):
+    """
+    Single device flow: process the logs in the working directory, add the rows
+    to the results store and/or the result CSVs, and move everything into the
+    run directory under base_dir.
+    """
+    # Paths to the CSV files
+    output_csv = f'{logname_base}_{benchmark.replace("/", "_")}_combined_results.csv'
+    output_csv_file = f'{logname_base}_{benchmark.replace("/", "_")}_measurment_results.csv'
+    output_csv_filename = 'benchmark_results.csv'
+
+    results = rawdata_process(logname_base, benchmark, baseline_window=baseline_window)
+    if not results:
+        raise FileNotFoundError(f"No {logname_base}_<i>_{benchmark}_time.txt files in the working directory")
+    log_filename = 'results.txt'  # Replace with your actual log file name
+    has_output = os.path.isfile(log_filename)
+    if has_output:
+        add_benchmark_metrics(results, benchmark, log_filename)
+    if write_csv:
+        # Write all results to a CSV file
+        pd.DataFrame(results).to_csv(output_csv_file, index=False)
+    if sweep_summary_csv is not None:
+        write_sweep_summary([{'Benchmark': benchmark, **row} for row in results], sweep_summary_csv)
+    if scaling_table_csv is not None:
+        write_scaling_summary([{'Benchmark': benchmark, **row} for row in results], scaling_table_csv, reference)
+    averages = {}
+    if has_output:
+        averages = process_benchmark_results(benchmark, log_filename, iterations,
+                                             output_csv_filename if write_csv else None)
+
+    if store_dir is not None:
+        rows = [{'Device': device_number, 'Logname': logname_base, 'Benchmark': benchmark, **row, **averages}
+                for row in results]
+        ResultsStore(store_dir).write(rows)
+        print(f"Results for {len(rows)} iterations written to the results store '{store_dir}'.")
+    if write_csv and os.path.isfile(output_csv_filename):
+        concatenate_averages_to_all_results(output_csv_file, output_csv_filename, output_csv)
+    organize_files(logname_base, device_number, benchmark, iterations, output_csv_file, output_csv_filename, output_csv,
+                   base_dir)
+    print(f"\nAll results written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ECE361E HW2 - benchmark_run')  
+    parser.add_argument('--logname', type=str, default=None, help='base name for the log file (default: exp1; all with --tree)')         
+    parser.add_argument('--benchmark', type=str, default=None, help='which benchmark to run (default: tp; all with --tree)')
+    parser.add_argument('--devicenumber', type=str, default="mc1_08", help='which benchmark to run')
+    parser.add_argument('--iterations', type=int, default=3,
+                        help='iteration count in the run directory name (all iterations found are processed)')
+    parser.add_argument('--results-dir', type=str, default=r'C:\Users\13462\Downloads\HW2',
+                        help='where the run directory of a single device is created')
+    parser.add_argument('--store', type=str, default='results_store', help='columnar results store to write to')
+    parser.add_argument('--csv', action='store_true',
+                        help='also write the CSV results (per device CSVs, or --output with --tree)')
+    parser.add_argument('--tree', type=str, default=None,
+                        help='process every {logname}_{device}_{benchmark}_{iterations} directory under this root')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for --tree (default: CPU count)')
+    parser.add_argument('--output', type=str, default='fleet_results.csv', help='fleet-wide CSV written by --tree --csv')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='result cache for --tree (default: .results_cache under the tree root)')
+    parser.add_argument('--cache-size-mb', type=float, default=256, help='result cache size limit')
+    parser.add_argument('--no-cache', action='store_true', help='recompute every iteration with --tree')
+    parser.add_argument('--scaling-table', type=str, default=None, metavar='CSV',
+                        help='write speedup and efficiency per placement of a placement sweep')
+    parser.add_argument('--reference', type=lambda mask: int(mask, 0), default=None,
+                        help='affinity mask the scaling table is relative to (default: fewest threads, big first)')
+    parser.add_argument('--sweep-summary', type=str, default=None, metavar='CSV',
+                        help='write mean metrics and efficiency per frequency point of a DVFS sweep')
+    parser.add_argument('--baseline-window', type=float, default=None, metavar='SECONDS',
+                        help='seconds of each idle guard band the idle power is measured over (default: all)')
+    args = parser.parse_args()
+
+    if args.tree is not None:
+        # --logname/--benchmark filter the tree only when given
+        cache_dir = None if args.no_cache else (args.cache_dir or os.path.join(args.tree, '.results_cache'))
+        fleet = process_tree(args.tree, args.logname, args.benchmark, args.workers, cache_dir,
+                             int(args.cache_size_mb * 1024 * 1024), args.baseline_window)
+        devices = fleet['Device'].nunique() if not fleet.empty else 0
+        if not fleet.empty:
+            ResultsStore(args.store).write(fleet)
+            print(f"Fleet results for {devices} devices written to the results store '{args.store}'.")
+        if args.csv:
+            fleet.to_csv(args.output, index=False)
+            print(f"Fleet results for {devices} devices written to '{args.output}'.")
+        if args.sweep_summary:
+            write_sweep_summary(fleet, args.sweep_summary)
+        if args.scaling_table:
+            write_scaling_summary(fleet, args.scaling_table, args.reference)
+    else:
+        process_device(args.logname or "exp1", args.benchmark or "tp", args.devicenumber, args.iterations,
+                       args.results_dir, args.store, args.csv, args.sweep_summary, args.scaling_table, args.reference,
+                       args.baseline_window)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# Analysis kernel for measurement logs.
+# Finds the benchmark window with a binary search over the sample timestamps,
+# interpolates every column at the exact start and end of the benchmark,
+# integrates power over the real timestamps inside the window only and computes
+# every summary statistic for every column in one vectorised pass over the window.
+# idle_baseline measures the idle power in the guard bands logged around the
+# benchmark, so the energy can be split into its static and dynamic parts, and
+# detect_throttling scans the window for frequency drops, temperature trip
+# crossings and power plateaus.
+
+import numpy as np
+import pandas as pd
+
+from streaming_stats import t_quantile
+
+STATS = ('mean', 'std', 'min', 'max', 'median')
+
+# Bump whenever a change alters computed metrics; invalidates cached results
+ANALYSIS_VERSION = 10
+
+# First trip point of the Exynos5422 thermal zones, where the big cluster is throttled
+THROTTLE_TEMP_C = 85.0
+# Cluster frequency and cap columns of the log per cluster (sampler.py node names)
+CLUSTER_FREQ_COLUMNS = {'big': ('big_core_freq', 'big_max_freq'),
+                        'little': ('little_core_freq', 'little_max_freq')}
+# Cluster a cpufreq cooling device throttles, by its type. Older kernels number
+# them thermal-cpufreq-<n> in registration order (the Exynos5422 registers the
+# big cluster first), newer ones name them cpufreq-cpu<first cpu of the policy>.
+# Other cooling devices (fans, GPU devfreq) do not slow the CPU clusters down.
+CPUFREQ_COOLING_CLUSTERS = {'thermal-cpufreq-0': 'big', 'thermal-cpufreq-1': 'little',
+                            'cpufreq-cpu4': 'big', 'cpufreq-cpu0': 'little'}
+
+
+def window_indices(time, start, end):
+    """
+    Slice bounds [start_idx, end_idx) of the samples covering the benchmark:
+    from the last sample before start up to and including the first sample after end.
+    """
+    start_idx = max(int(np.searchsorted(time, start, side='left')) - 1, 0)
+    end_idx = min(int(np.searchsorted(time, end, side='right')) + 1, len(time))
+    return start_idx, end_idx
+
+
+def window_samples(time, values, start, end):
+    """
+    Timestamps and values of the samples strictly inside (start, end), framed by
+    the values linearly interpolated at start and end themselves (held flat
+    beyond the first and last sample). values is one column or a
+    (columns x samples) block; the result always has at least the two edge samples.
+    """
+    values = np.atleast_2d(values)
+    lo = int(np.searchsorted(time, start, side='right'))
+    hi = int(np.searchsorted(time, end, side='left'))
+    inside = values[:, lo:hi]
+    edges = np.array([[np.interp(t, time, row) for t in (start, end)] for row in values]).reshape(-1, 2)
+    grid = np.concatenate(([start], time[lo:hi], [end]))
+    return grid, np.hstack([edges[:, :1], inside, edges[:, 1:]])
+
+
+def cumulative_energy(time, power):
+    """
+    Energy in J accumulated up to every sample (trapezoidal rule over the timestamps).
+    """
+    energy = np.zeros(len(power))
+    if len(power) > 1:
+        energy[1:] = np.cumsum(0.5 * (power[1:] + power[:-1]) * np.diff(time))
+    return energy
+
+
+def idle_baseline(time, power, start, end, window=None, skip=0.25):
+    """
+    Idle power from the guard bands before start and after end: the samples up
+    to `window` seconds away from the benchmark (the whole band by default),
+    ignoring the `skip` seconds right next to it where the benchmark starts up
+    and winds down. Returns (mean, 95% confidence half-width, samples); the mean
+    is None when the bands hold no samples, the half-width NaN below two.
+    Samples are treated as independent.
+    """
+    time = np.asarray(time, dtype=float)
+    power = np.asarray(power, dtype=float)
+    window = np.inf if window is None else window
+    idle = ((time >= start - window) & (time <= start - skip)) | ((time >= end + skip) & (time <= end + window))
+    idle = power[idle & np.isfinite(power)]
+    if not len(idle):
+        return None, np.nan, 0
+    half_width = t_quantile(len(idle) - 1) * idle.std(ddof=1) / np.sqrt(len(idle)) if len(idle) > 1 else np.nan
+    return float(idle.mean()), float(half_width), len(idle)
+
+
+def counter_totals(counts, end_idx):
+    """
+    Total of a cumulative counter column over the benchmark. Counting starts when
+    the probe attaches to the benchmark, so this is the largest value logged up
+    to end_idx; None if the counter never produced a value.
+    """
+    counts = np.asarray(counts[:end_idx], dtype=float)
+    if not np.isfinite(counts).any():
+        return None
+    return float(np.nanmax(counts))
+
+
+def interval_ratio(numerator, denominator):
+    """
+    Ratio of the per-sample increments of two cumulative counters, e.g. IPC over
+    time from instructions and cycles. NaN where the denominator did not advance.
+    """
+    num = np.diff(np.asarray(numerator, dtype=float))
+    den = np.diff(np.asarray(denominator, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _intervals(time, mask):
+    """
+    (start, end) times of the runs of True in mask, where sample i holds its value
+    until time[i + 1].
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], mask, [False])).astype(int)))
+    return [(float(time[a]), float(time[min(b, len(time) - 1)])) for a, b in zip(edges[::2], edges[1::2])]
+
+
+def detect_throttling(log, start, end, expected_freqs=None, clusters=('big', 'little'), meter=None,
+                      cooling_devices=None, temp_threshold=THROTTLE_TEMP_C, freq_tolerance=0.02,
+                      power_drop=0.15, plateau_samples=5):
+    """
+    Find the parts of the benchmark window that ran throttled. A sample counts as
+    throttled when a cluster in clusters ran more than freq_tolerance below its
+    expected frequency (expected_freqs {'big': khz, 'little': khz}, by default the
+    highest frequency in the window), when its frequency cap was lowered or its
+    cpufreq cooling device was active, or when a temperature reached temp_threshold.
+    cooling_devices maps cooling device numbers to their types (the log header's
+    'cooling_devices'); the states of other devices (fans, devfreq, unknown
+    types) are only reported, as the share of the window each was active.
+    Power plateaus (the rolling median of plateau_samples samples falling more than
+    power_drop below the 95th percentile) are reported always, but only count as
+    throttling for logs without frequency columns.
+
+    Returns a dict with the time-weighted shares of the window that were throttled,
+    over the temperature threshold and on a power plateau, the mean ratio of the
+    actual to the expected frequency of the most throttled cluster (None without
+    frequency columns), the mean power outside the throttled intervals, the
+    intervals as (start, end, kind) relative to the benchmark start, and the
+    active shares of the cooling devices that were not counted.
+    """
+    names = column_names(log)
+    time = np.asarray(log['time'], dtype=float)
+    start_idx, end_idx = window_indices(time, start, end)
+    time = time[start_idx:end_idx]
+    # Time each sample holds for inside [start, end]
+    held = np.clip(np.append(time[1:], time[-1]), start, end) - np.clip(time, start, end)
+    total = held.sum()
+
+    def column(name):
+        return np.asarray(log[name][start_idx:end_idx], dtype=float)
+
+    def share(mask):
+        return float(held[mask].sum() / total) if total > 0 else 0.0
+
+    freq = np.zeros(len(time), dtype=bool)
+    ratios = []
+    for cluster in clusters:
+        freq_column, cap_column = CLUSTER_FREQ_COLUMNS[cluster]
+        if freq_column not in names:
+            continue
+        actual = column(freq_column)
+        if not np.isfinite(actual).any():
+            continue
+        expected = (expected_freqs or {}).get(cluster) or np.nanmax(actual)
+        floor = expected * (1 - freq_tolerance)
+        freq |= actual < floor
+        if cap_column in names:
+            freq |= column(cap_column) < floor
+        ratios.append(np.minimum(actual / expected, 1.0))
+    types = {int(i): kind for i, kind in (cooling_devices or {}).items()}
+    cpu_cooling = False
+    other_cooling = {}
+    for name in names:
+        if not name.startswith('cooling_state_'):
+            continue
+        number = int(name[len('cooling_state_'):])
+        active = column(name) > 0
+        if CPUFREQ_COOLING_CLUSTERS.get(types.get(number)) in clusters:
+            freq |= active
+            cpu_cooling = True
+        elif active.any():
+            other_cooling[f"{types.get(number, 'unknown')} ({number})"] = share(active)
+
+    temps = [name for name in names if name.startswith('temp')]
+    temp = np.zeros(len(time), dtype=bool)
+    for name in temps:
+        temp |= column(name) >= temp_threshold
+
+    if meter is not None:
+        power_time = np.asarray(meter['time'], dtype=float)
+        power = np.interp(time, power_time, np.asarray(meter['power'], dtype=float))
+    else:
+        power = column('power') if 'power' in names else np.full(len(time), np.nan)
+    rolling = pd.Series(power).rolling(plateau_samples, center=True, min_periods=1).median().to_numpy()
+    inside = held > 0
+    plateau = np.zeros(len(time), dtype=bool)
+    if inside.sum() >= plateau_samples and np.isfinite(power[inside]).any():
+        plateau = rolling < (1 - power_drop) * np.nanpercentile(power[inside], 95)
+
+    throttled = freq | temp | (plateau if not ratios and not cpu_cooling else False)
+    steady = ~throttled & inside & np.isfinite(power)
+    intervals = sorted((max(t0, start) - start, min(t1, end) - start, kind)
+                       for kind, mask in (('freq', freq), ('temp', temp), ('plateau', plateau))
+                       for t0, t1 in _intervals(time, mask & inside))
+    return {
+        'throttled_share': share(throttled),
+        'temp_share': share(temp),
+        'plateau_share': share(plateau),
+        'freq_ratio': float(np.average(np.min(ratios, axis=0), weights=held)) if ratios and total > 0 else None,
+        'steady_power': float(np.average(power[steady], weights=held[steady])) if held[steady].sum() > 0 else None,
+        'events': len(_intervals(time, throttled & inside)),
+        'intervals': intervals,
+        'other_cooling': other_cooling,
+    }
+
+
+def summarize(block, names):
+    """
+    Summary statistics for a (columns x samples) block, one row per column.
+    """
+    return pd.DataFrame({
+        'mean': block.mean(axis=1),
+        'std': block.std(axis=1),
+        'min': block.min(axis=1),
+        'max': block.max(axis=1),
+        'median': np.median(block, axis=1),
+    }, index=pd.Index(names, name='column'))
+
+
+def analyze_run(log, start, end, columns=None, meter=None, counters=(), baseline_window=None):
+    """
+    Analyse one iteration. log is a DataFrame or structured array with a 'time'
+    column; start/end are the benchmark timestamps. meter, when given, holds the
+    full power meter stream ('time'/'power') and replaces the logged power column.
+    counters names cumulative hardware counter columns to total, if the log has them.
+    baseline_window limits the guard band seconds the idle baseline is taken from.
+
+    Every column is interpolated at start and end, so only the benchmark itself
+    is integrated and summarised. The power mean is the time-weighted one,
+    energy / runtime.
+
+    Returns a dict with the runtime, total energy, the cumulative energy curve,
+    the counter totals, the IPC of every sampling interval of the window ('ipc',
+    ending at 'ipc_time'; empty without instruction and cycle counters), the idle baseline with the static and dynamic energy
+    (see baseline_split) and a DataFrame of STATS per column (plus 'energy') over
+    the benchmark window.
+    """
+    time = np.asarray(log['time'], dtype=float)
+    if columns is None:
+        columns = [name for name in column_names(log) if name != 'time']
+    start_idx, end_idx = window_indices(time, start, end)
+    block = np.vstack([np.asarray(log[name][start_idx:end_idx], dtype=float) for name in columns])
+    window_time, block = window_samples(time[start_idx:end_idx], block, start, end)
+
+    if meter is not None:
+        idle = idle_baseline(meter['time'], meter['power'], start, end, baseline_window)
+    elif 'power' in column_names(log):
+        idle = idle_baseline(time, log['power'], start, end, baseline_window)
+    else:
+        idle = (None, np.nan, 0)
+
+    if meter is not None:
+        power_time = np.asarray(meter['time'], dtype=float)
+        lo, hi = window_indices(power_time, start, end)
+        power_time, power = window_samples(power_time[lo:hi], np.asarray(meter['power'][lo:hi], dtype=float),
+                                           start, end)
+        power = power[0]
+    else:
+        power_time = window_time
+        power = block[columns.index('power')]
+
+    if {'instructions', 'cycles'} <= set(counters) & set(column_names(log)):
+        ipc_time = time[start_idx + 1:end_idx]
+        ipc = interval_ratio(log['instructions'][start_idx:end_idx], log['cycles'][start_idx:end_idx])
+    else:
+        ipc_time, ipc = np.empty(0), np.empty(0)
+
+    energy = cumulative_energy(power_time, power)
+    stats = summarize(block, columns)
+    stats.loc['power'] = summarize(power[np.newaxis], ['power']).iloc[0]
+    if end > start:
+        stats.loc['power', 'mean'] = energy[-1] / (end - start)
+    stats.loc['energy'] = summarize(energy[np.newaxis], ['energy']).iloc[0]
+
+    return {
+        'start_idx': start_idx,
+        'end_idx': end_idx,
+        'runtime': end - start,
+        'energy': float(energy[-1]) if len(energy) else 0.0,
+        'energy_curve': energy,
+        'baseline': baseline_split(energy[-1] if len(energy) else 0.0, end - start, *idle),
+        'counters': {name: counter_totals(log[name], end_idx) for name in counters if name in column_names(log)},
+        'ipc_time': ipc_time,
+        'ipc': ipc,
+        'stats': stats,
+    }
+
+
+def baseline_split(energy, runtime, idle_power, half_width, samples):
+    """
+    Split a window's energy into the static part (idle power over the runtime) and
+    the dynamic part above it, each with the 95% confidence half-width carried
+    over from the idle power. All None without an idle baseline.
+    """
+    if idle_power is None:
+        return {'idle_power': None, 'idle_power_ci': None, 'idle_samples': samples, 'static_energy': None,
+                'dynamic_energy': None, 'dynamic_power': None, 'energy_ci': None}
+    static = idle_power * runtime
+    return {
+        'idle_power': idle_power,
+        'idle_power_ci': half_width,
+        'idle_samples': samples,
+        'static_energy': static,
+        'dynamic_energy': energy - static,
+        'dynamic_power': (energy - static) / runtime if runtime > 0 else None,
+        'energy_ci': half_width * runtime,
+    }
+
+
+def pooled_stats(stats, names):
+    """
+    Mean and standard deviation of several equally long columns taken together
+    (e.g. all big core temperatures), from their per-column statistics.
+    """
+    mean = stats.loc[names, 'mean'].to_numpy()
+    std = stats.loc[names, 'std'].to_numpy()
+    pooled_mean = mean.mean()
+    pooled_var = (std ** 2 + mean ** 2).mean() - pooled_mean ** 2
+    return pooled_mean, np.sqrt(max(pooled_var, 0.0))
+
+
+def column_names(log):
+    """
+    Column names of a DataFrame or structured array log.
+    """
+    if isinstance(log, pd.DataFrame):
+        return list(log.columns)
+    return list(log.dtype.names)
@@ -0,0 +1,176 @@
+# Parsers for benchmark output (TPBench, PARSEC blackscholes and bodytrack).
+# Each parser is a generator that reads its file exactly once, line by line,
+# and yields typed records as soon as they are complete. With follow=True it
+# keeps waiting for new lines at the end of the file, so results can be watched
+# while the benchmark is still writing them.
+
+import argparse
+import re
+import time
+from collections import namedtuple
+
+TPBenchRecord = namedtuple('TPBenchRecord', [
+    'iteration', 'operation', 'papi_instructions', 'papi_cycles', 'ipc',
+    'overall_throughput', 'operation_time'])
+
+# PARSEC benchmarks print one block per run; "[HOOKS] Total time spent in ROI"
+# is only there when they were built with the PARSEC hooks
+BlackscholesRecord = namedtuple('BlackscholesRecord', ['iteration', 'options', 'runs', 'roi_time'])
+BodytrackRecord = namedtuple('BodytrackRecord', ['iteration', 'threads', 'frames', 'roi_time'])
+
+_NUMBER = r'\d+(?:\.\d+)?(?:[eE][+-]?\d+)?'
+
+# One pattern for every TPBench line of interest; the named group that matched
+# selects the handler in _TPBENCH_FIELDS.
+_TPBENCH_LINE = re.compile(
+    r'(?:Starting iteration\s+(?P<iteration>\d+)'
+    r'|Doing\s+(?P<operation>.+?)\s*$'
+    r'|PAPI instructions\s*:\s*(?P<papi_instructions>\d+)'
+    r'|PAPI cycles\s*:\s*(?P<papi_cycles>\d+)'
+    r'|IPC\s*:\s*(?P<ipc>' + _NUMBER + r')'
+    r'|Overall throughput\D*?(?P<overall_throughput>' + _NUMBER + r')'
+    r'|Performed.*?(?P<operation_time>\d+\.\d+) seconds)')
+
+_TPBENCH_FIELDS = {
+    'papi_instructions': int,
+    'papi_cycles': int,
+    'ipc': float,
+    'overall_throughput': float,
+    'operation_time': float,
+}
+
+
+_BLACKSCHOLES_LINE = re.compile(
+    r'(?:Starting iteration\s+(?P<iteration>\d+)'
+    r'|Num of Options:\s*(?P<options>\d+)'
+    r'|Num of Runs:\s*(?P<runs>\d+)'
+    r'|\[HOOKS\] Total time spent in ROI:\s*(?P<roi_time>' + _NUMBER + r')s?)')
+
+_BODYTRACK_LINE = re.compile(
+    r'(?:Starting iteration\s+(?P<iteration>\d+)'
+    r'|Number of [Tt]hreads\s*:\s*(?P<threads>\d+)'
+    r'|(?P<frames>Processing frame)\b'
+    r'|\[HOOKS\] Total time spent in ROI:\s*(?P<roi_time>' + _NUMBER + r')s?)')
+
+_PARSEC_FIELDS = {
+    'options': int,
+    'runs': int,
+    'threads': int,
+    'roi_time': float,
+}
+
+
+def follow_lines(filename, follow=False, poll_interval=0.5, stop=None):
+    """
+    Yield complete lines of filename. With follow=True, wait for more lines at
+    the end of the file until stop() returns True (or forever without stop).
+    """
+    with open(filename, 'r') as file:
+        pending = ''
+        while True:
+            line = file.readline()
+            if line:
+                if line.endswith('\n'):
+                    yield pending + line
+                    pending = ''
+                else:
+                    # Incomplete last line of a file that is still being written
+                    pending += line
+                continue
+            if not follow or (stop is not None and stop()):
+                break
+            time.sleep(poll_interval)
+        if pending:
+            yield pending
+
+
+def parse_tpbench(filename, follow=False, poll_interval=0.5, stop=None):
+    """
+    Yield one TPBenchRecord per 'Doing <operation>' block of a TPBench log.
+    Lines before the first 'Starting iteration' are ignored. Fields that did not
+    appear in a block are None.
+    """
+    iteration = None
+    current = None
+
+    for line in follow_lines(filename, follow, poll_interval, stop):
+        match = _TPBENCH_LINE.match(line.strip())
+        if match is None:
+            continue
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'iteration' or kind == 'operation':
+            if current is not None:
+                yield TPBenchRecord(**current)
+                current = None
+            if kind == 'iteration':
+                iteration = int(value)
+            elif iteration is not None:
+                current = dict.fromkeys(TPBenchRecord._fields)
+                current.update(iteration=iteration, operation=value)
+        elif current is not None:
+            current[kind] = _TPBENCH_FIELDS[kind](value)
+
+    if current is not None:
+        yield TPBenchRecord(**current)
+
+
+def _parse_iterations(filename, pattern, record_type, follow, poll_interval, stop):
+    # One record per 'Starting iteration' block; 'frames' counts matching lines
+    current = None
+    for line in follow_lines(filename, follow, poll_interval, stop):
+        match = pattern.match(line.strip())
+        if match is None:
+            continue
+        kind = match.lastgroup
+        if kind == 'iteration':
+            if current is not None:
+                yield record_type(**current)
+            current = dict.fromkeys(record_type._fields)
+            current['iteration'] = int(match.group(kind))
+        elif current is None:
+            continue
+        elif kind == 'frames':
+            current['frames'] = (current['frames'] or 0) + 1
+        else:
+            current[kind] = _PARSEC_FIELDS[kind](match.group(kind))
+    if current is not None:
+        yield record_type(**current)
+
+
+def parse_blackscholes(filename, follow=False, poll_interval=0.5, stop=None):
+    """
+    Yield one BlackscholesRecord per iteration of a PARSEC blackscholes log.
+    """
+    return _parse_iterations(filename, _BLACKSCHOLES_LINE, BlackscholesRecord, follow, poll_interval, stop)
+
+
+def parse_bodytrack(filename, follow=False, poll_interval=0.5, stop=None):
+    """
+    Yield one BodytrackRecord per iteration of a PARSEC bodytrack log; frames is
+    the number of 'Processing frame' lines.
+    """
+    return _parse_iterations(filename, _BODYTRACK_LINE, BodytrackRecord, follow, poll_interval, stop)
+
+
+def main():
+    # The registry imports this module, so it is only looked up here
+    from benchmarks import BENCHMARKS
+    parser = argparse.ArgumentParser(description='Print benchmark records from a results file')
+    parser.add_argument('filename', nargs='?', default='results.txt', help='benchmark output')
+    parser.add_argument('--benchmark', choices=sorted(BENCHMARKS), default='tp', help='which benchmark wrote the file')
+    parser.add_argument('--follow', action='store_true', help='keep reading while the file grows')
+    args = parser.parse_args()
+    try:
+        for record in BENCHMARKS[args.benchmark].parser(args.filename, follow=args.follow):
+            if args.benchmark == 'tp':
+                print(f"iteration {record.iteration} {record.operation}: IPC {record.ipc}, "
+                      f"throughput {record.overall_throughput}, time {record.operation_time} s")
+            else:
+                print(', '.join(f"{field} {value}" for field, value in record._asdict().items()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# Benchmark registry.
+# Every workload is one Benchmark definition: how to launch it (command template,
+# CPU affinity mask, thread count, input sets), how to parse what it prints, and
+# which metrics the parsed output turns into. run_benchmark.py launches from
+# here and DataProcessing.py extracts metrics from here, so adding a workload
+# means adding one definition at the bottom of this file.
+#
+# Throughput is always reported as 'Throughput (ops/s)', counted in the
+# benchmark's own unit of work: TPBench operations, option prices, frames.
+
+from collections import defaultdict
+
+from benchmark_parsers import parse_blackscholes, parse_bodytrack, parse_tpbench
+
+BENCHMARK_ROOT = '/home/student/HW2_files'
+
+# TPBench record fields and the column names they are averaged into
+TP_AVERAGED_FIELDS = [
+    ('papi_instructions', 'PAPI instructions'),
+    ('papi_cycles', 'PAPI cycles'),
+    ('ipc', 'IPC'),
+    ('overall_throughput', 'Overall throughput'),
+    ('operation_time', 'Operation time'),
+]
+
+
+# Exynos5422: cores 0-3 are the LITTLE (A7) cluster, 4-7 the big (A15) cluster
+LITTLE_CORES = (0, 1, 2, 3)
+BIG_CORES = (4, 5, 6, 7)
+
+# Named placement sweeps: 1-4 big cores, 1-4 LITTLE cores, and equal big.LITTLE mixes
+PLACEMENT_SETS = {
+    'big': [0x10, 0x30, 0x70, 0xF0],
+    'little': [0x01, 0x03, 0x07, 0x0F],
+    'mixed': [0x11, 0x33, 0x77, 0xFF],
+}
+
+
+def cores_of(mask):
+    """
+    Core numbers set in an affinity mask, e.g. [4, 5, 6, 7] for 0xF0.
+    """
+    return [core for core in range(mask.bit_length()) if mask >> core & 1]
+
+
+def parse_placements(specs, default_threads=None):
+    """
+    (affinity mask, threads) pairs from specs like '0xF0', '0x30:2' or a name
+    from PLACEMENT_SETS ('big', 'little', 'mixed'). Threads default to
+    default_threads, or to the number of cores in the mask if it is None.
+    """
+    placements = []
+    for spec in specs:
+        if spec in PLACEMENT_SETS:
+            placements += [(mask, default_threads or len(cores_of(mask))) for mask in PLACEMENT_SETS[spec]]
+            continue
+        mask, _, threads = spec.partition(':')
+        try:
+            mask = int(mask, 0)
+            threads = int(threads) if threads else default_threads or len(cores_of(mask))
+        except ValueError:
+            raise ValueError(f"Bad placement '{spec}': expected MASK[:THREADS] or one of "
+                             f"{', '.join(PLACEMENT_SETS)}") from None
+        if mask <= 0 or mask >= 1 << (len(LITTLE_CORES) + len(BIG_CORES)) or threads < 1:
+            raise ValueError(f"Bad placement '{spec}': mask must select cores 0-7 and threads be positive")
+        placements.append((mask, threads))
+    return placements
+
+
+class Benchmark:
+    """
+    One workload. command is a template with {root}, {threads} and {input}
+    placeholders; inputs maps input set names to what {input} expands to.
+    metrics(records) returns {iteration: {column: value}} from the parsed output;
+    work_column names the metric counting units of work, used to derive the
+    throughput from the runtime when the output has no timing of its own.
+    """
+
+    def __init__(self, name, title, command, affinity, threads=1, inputs=None, default_input=None,
+                 parser=None, metrics=None, metric_columns=(), work_column=None):
+        self.name = name
+        self.title = title
+        self.command = command
+        self.affinity = affinity
+        self.threads = threads
+        self.inputs = inputs or {}
+        self.default_input = default_input or next(iter(self.inputs), None)
+        self.parser = parser
+        self.metrics = metrics
+        self.metric_columns = tuple(metric_columns)
+        self.work_column = work_column
+
+    @property
+    def fixed_threads(self):
+        """
+        True if the command has no {threads} placeholder, so it always runs self.threads threads.
+        """
+        return '{threads}' not in self.command
+
+    def command_line(self, root=BENCHMARK_ROOT, affinity=None, threads=None, input_set=None):
+        """
+        Argument list that launches the benchmark pinned to the affinity mask.
+        Raises ValueError for a thread count the command cannot be given.
+        """
+        input_set = input_set or self.default_input
+        if self.inputs and input_set not in self.inputs:
+            raise ValueError(f"{self.name} has no input set '{input_set}' (known: {', '.join(self.inputs)})")
+        if threads not in (None, self.threads) and self.fixed_threads:
+            raise ValueError(f"{self.name} always runs {self.threads} thread(s); it cannot be run with {threads}")
+        mask = self.affinity if affinity is None else affinity
+        command = self.command.format(root=root, threads=threads or self.threads,
+                                      input=self.inputs.get(input_set, '').format(root=root))
+        return ['taskset', '--all-tasks', f'{mask:#x}'] + command.split()
+
+    def iteration_metrics(self, results_file):
+        """
+        {iteration: {column: value}} of the metrics found in the benchmark output.
+        """
+        if self.parser is None or self.metrics is None:
+            return {}
+        return self.metrics(self.parser(results_file))
+
+    def averages(self, results_file):
+        """
+        Metrics averaged over all iterations, as 'Avg <column>' entries.
+        """
+        columns = defaultdict(list)
+        for metrics in self.iteration_metrics(results_file).values():
+            for column, value in metrics.items():
+                if value is not None:
+                    columns[column].append(value)
+        return {f'Avg {column}': sum(values) / len(values) for column, values in columns.items()}
+
+
+class TPBench(Benchmark):
+    """
+    TPBench reports several operations per iteration; its averages are kept per
+    operation, as the original benchmark_results.csv had them.
+    """
+
+    def averages(self, results_file):
+        operations_data = defaultdict(lambda: {field: [] for field, _ in TP_AVERAGED_FIELDS})
+        for record in self.parser(results_file):
+            data = operations_data[record.operation]
+            for field, _ in TP_AVERAGED_FIELDS:
+                value = getattr(record, field)
+                if value is not None:
+                    data[field].append(value)
+
+        averages_result = {}
+        for op, data in operations_data.items():
+            for field, label in TP_AVERAGED_FIELDS:
+                values = data[field]
+                averages_result[f'Avg {label} ({op})'] = sum(values) / len(values) if values else None
+        return averages_result
+
+
+def tpbench_metrics(records):
+    # Mean overall throughput over the operations of each iteration
+    throughput = defaultdict(list)
+    for record in records:
+        if record.overall_throughput is not None:
+            throughput[record.iteration].append(record.overall_throughput)
+    return {i: {'Throughput (ops/s)': sum(values) / len(values)} for i, values in throughput.items()}
+
+
+def blackscholes_metrics(records):
+    metrics = {}
+    for record in records:
+        priced = record.options * (record.runs or 1) if record.options is not None else None
+        metrics[record.iteration] = {
+            'Options Priced': priced,
+            'ROI Time (s)': record.roi_time,
+            'Throughput (ops/s)': priced / record.roi_time if priced and record.roi_time else None,
+        }
+    return metrics
+
+
+def bodytrack_metrics(records):
+    metrics = {}
+    for record in records:
+        metrics[record.iteration] = {
+            'Frames': record.frames,
+            'ROI Time (s)': record.roi_time,
+            'Throughput (ops/s)': record.frames / record.roi_time if record.frames and record.roi_time else None,
+        }
+    return metrics
+
+
+BENCHMARKS = {}
+
+
+def register(benchmark):
+    BENCHMARKS[benchmark.name] = benchmark
+    return benchmark
+
+
+def get_benchmark(name):
+    """
+    Registered benchmark by name; ValueError for unknown names.
+    """
+    try:
+        return BENCHMARKS[name]
+    except KeyError:
+        raise ValueError(f"Unknown benchmark '{name}' (known: {', '.join(sorted(BENCHMARKS))})") from None
+
+
+register(TPBench(
+    'tp', 'TPBench',
+    command='{root}/TPBench.exe',
+    affinity=0x10,  # core 4 (7 6 5 4 3 2 1 0)
+    parser=parse_tpbench, metrics=tpbench_metrics,
+    metric_columns=['Throughput (ops/s)']))
+
+register(Benchmark(
+    'bs', 'PARSEC blackscholes',
+    command='{root}/parsec_files/blackscholes {threads} {input} out',
+    affinity=0xF0, threads=4,  # cores 7654, 4 threads
+    inputs={'10M': '{root}/parsec_files/in_10M_blackscholes.txt'},
+    parser=parse_blackscholes, metrics=blackscholes_metrics,
+    metric_columns=['Options Priced', 'ROI Time (s)', 'Throughput (ops/s)'], work_column='Options Priced'))
+
+register(Benchmark(
+    'bt', 'PARSEC bodytrack',
+    # <dataset> <cameras> <frames> <particles> <layers> <thread model> <threads> <output>
+    command='{root}/parsec_files/bodytrack {input} 4 260 3000 8 3 {threads} 0',
+    affinity=0xF0, threads=4,  # cores 7654, 4 threads
+    inputs={'sequenceB_261': '{root}/parsec_files/sequenceB_261'},
+    parser=parse_bodytrack, metrics=bodytrack_metrics,
+    metric_columns=['Frames', 'ROI Time (s)', 'Throughput (ops/s)'], work_column='Frames'))
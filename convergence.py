@@ -0,0 +1,124 @@
+# Statistical convergence mode of run_benchmark.py.
+# Instead of a fixed iteration count, every operating point runs until the 95%
+# confidence intervals of its mean runtime and energy are within a relative
+# target (e.g. ±1%) or a maximum count is reached. An iteration whose runtime
+# or energy lies far from the median of the accepted ones is flagged as an
+# outlier, left out of the intervals and made up for by another iteration.
+
+import json
+import math
+import statistics
+
+import numpy as np
+
+from streaming_stats import t_quantile
+
+METRICS = ('runtime', 'energy')
+
+
+def window_energy(time, power, start, end):
+    """
+    Energy in J between start and end from a power stream, with the power
+    interpolated at both ends; None without readings.
+    """
+    time = np.asarray(time, dtype=float)
+    power = np.asarray(power, dtype=float)
+    if not len(time):
+        return None
+    inside = (time > start) & (time < end)
+    t = np.concatenate(([start], time[inside], [end]))
+    p = np.concatenate(([np.interp(start, time, power)], power[inside], [np.interp(end, time, power)]))
+    return float(np.sum(0.5 * (p[1:] + p[:-1]) * np.diff(t)))
+
+
+class ConvergenceTracker:
+    """
+    Runtime and energy of the iterations of every operating point (any hashable
+    key). A point is done once it has min_iterations accepted iterations and the
+    relative 95% confidence half-width of every metric is at most target, or once
+    max_iterations iterations (outliers included) have run.
+
+    An iteration is an outlier when, with min_iterations accepted iterations to
+    compare against, a metric deviates from their median by more than
+    outlier_threshold robust standard deviations (1.4826 x MAD, but never less
+    than target x median, so deviations below the target precision never count).
+    """
+
+    def __init__(self, target=0.01, min_iterations=3, max_iterations=20, outlier_threshold=3.5):
+        self.target = target
+        self.min_iterations = min_iterations
+        self.max_iterations = max_iterations
+        self.outlier_threshold = outlier_threshold
+        self.points = {}
+
+    def accepted(self, point):
+        return [s for s in self.points.get(point, []) if not s['outlier']]
+
+    def _is_outlier(self, point, sample):
+        accepted = self.accepted(point)
+        if len(accepted) < self.min_iterations:
+            return False
+        for metric in METRICS:
+            values = [s[metric] for s in accepted if s[metric] is not None]
+            if sample[metric] is None or len(values) < self.min_iterations:
+                continue
+            median = statistics.median(values)
+            mad = statistics.median(abs(v - median) for v in values)
+            scale = max(1.4826 * mad, self.target * abs(median))
+            if scale > 0 and abs(sample[metric] - median) / scale > self.outlier_threshold:
+                return True
+        return False
+
+    def add(self, point, iteration, runtime, energy=None):
+        """
+        Record an iteration; returns True if it was flagged as an outlier.
+        """
+        sample = {'iteration': iteration, 'runtime': runtime, 'energy': energy, 'outlier': False}
+        sample['outlier'] = self._is_outlier(point, sample)
+        self.points.setdefault(point, []).append(sample)
+        return sample['outlier']
+
+    def relative_ci(self, point, metric):
+        """
+        95% confidence half-width of the metric's mean over the accepted
+        iterations, relative to the mean; inf with fewer than two values.
+        """
+        values = [s[metric] for s in self.accepted(point) if s[metric] is not None]
+        if len(values) < 2:
+            return math.inf
+        mean = statistics.fmean(values)
+        half_width = t_quantile(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
+        return half_width / abs(mean) if mean else math.inf
+
+    def converged(self, point):
+        accepted = self.accepted(point)
+        if len(accepted) < self.min_iterations:
+            return False
+        # Energy only counts if the power meter delivered readings
+        metrics = [m for m in METRICS if any(s[m] is not None for s in accepted)]
+        return all(self.relative_ci(point, m) <= self.target for m in metrics)
+
+    def done(self, point):
+        return len(self.points.get(point, [])) >= self.max_iterations or self.converged(point)
+
+    def summary(self):
+        """
+        Per point: iterations run, accepted and rejected as outliers, the relative
+        confidence half-widths and whether the target was met.
+        """
+        summary = []
+        for point, samples in self.points.items():
+            summary.append({
+                'point': list(point) if isinstance(point, tuple) else point,
+                'iterations': [s['iteration'] for s in samples if not s['outlier']],
+                'outliers': [s['iteration'] for s in samples if s['outlier']],
+                **{f'{m}_relative_ci': (ci if math.isfinite(ci) else None)
+                   for m in METRICS for ci in [self.relative_ci(point, m)]},
+                'converged': self.converged(point),
+            })
+        return summary
+
+    def write(self, fname):
+        with open(fname, 'w') as f:
+            json.dump({'target': self.target, 'min_iterations': self.min_iterations,
+                       'max_iterations': self.max_iterations, 'points': self.summary()}, f, indent=1)
@@ -0,0 +1,96 @@
+# Thermal-feedback cooldown between iterations.
+# Instead of sleeping a fixed time, the board is polled until the big core
+# temperatures and idle power are back within a tolerance of the baseline taken
+# before the first iteration, or until a timeout. Every poll is written to a
+# small tab separated log, so the cooldown curve can be inspected afterwards.
+
+import time
+
+
+class CooldownController:
+    """
+    read_temps() returns the core temperatures in degrees C; read_power(), if given,
+    returns the idle power in W or None when no reading is available. Once a power
+    baseline was measured, polls without a power reading do not count as settled
+    (the timeout still applies); without a power baseline only the temperatures
+    count. The board counts as cooled down once `settle` consecutive polls are all
+    within tolerance of the baseline.
+    """
+
+    def __init__(self, read_temps, read_power=None, temp_tolerance=2.0, power_tolerance=0.2,
+                 poll_interval=1.0, timeout=120.0, settle=3, clock=time.time, sleep=time.sleep):
+        self.read_temps = read_temps
+        self.read_power = read_power
+        self.temp_tolerance = temp_tolerance
+        self.power_tolerance = power_tolerance
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.settle = settle
+        self.clock = clock
+        self.sleep = sleep
+        self.baseline_temps = None
+        self.baseline_power = None
+
+    def _power(self):
+        return self.read_power() if self.read_power is not None else None
+
+    def measure_baseline(self, duration=5.0):
+        """
+        Average temperatures and power over `duration` seconds of idle polling.
+        Call this before the first iteration, with the board idle.
+        """
+        temps, powers = [], []
+        end = self.clock() + duration
+        while True:
+            temps.append(self.read_temps())
+            power = self._power()
+            if power is not None:
+                powers.append(power)
+            if self.clock() >= end:
+                break
+            self.sleep(self.poll_interval)
+        self.baseline_temps = [sum(column) / len(column) for column in zip(*temps)]
+        self.baseline_power = sum(powers) / len(powers) if powers else None
+        return self.baseline_temps, self.baseline_power
+
+    def within_tolerance(self, temps, power):
+        # Only heat above the baseline matters; a board cooler than its baseline is ready
+        if any(t - b > self.temp_tolerance for t, b in zip(temps, self.baseline_temps)):
+            return False
+        if self.baseline_power is None:
+            return True
+        # A meter that has not delivered a reading yet says nothing about the power
+        return power is not None and power - self.baseline_power <= self.power_tolerance
+
+    def wait(self, log_fname=None):
+        """
+        Block until the board has cooled down or the timeout expires. Without a
+        baseline this is a plain sleep of `timeout` seconds. Returns a dict with the
+        seconds waited, whether the board settled, and the last temperatures/power.
+        """
+        start = self.clock()
+        if self.baseline_temps is None:
+            self.sleep(self.timeout)
+            return {'seconds': self.clock() - start, 'settled': False, 'temps': None, 'power': None}
+
+        log = open(log_fname, 'w') if log_fname else None
+        if log:
+            names = '\t'.join(f'temp{4 + i}' for i in range(len(self.baseline_temps)))
+            log.write(f"time\telapsed\tpower\t{names}\n")
+        in_tolerance = 0
+        try:
+            while True:
+                now = self.clock()
+                temps = self.read_temps()
+                power = self._power()
+                if log:
+                    log.write(f"{now}\t{now - start:.3f}\t{'' if power is None else power}\t"
+                              + '\t'.join(str(t) for t in temps) + '\n')
+                in_tolerance = in_tolerance + 1 if self.within_tolerance(temps, power) else 0
+                settled = in_tolerance >= self.settle
+                if settled or now - start >= self.timeout:
+                    return {'seconds': now - start, 'settled': settled, 'temps': temps, 'power': power}
+                self.sleep(self.poll_interval)
+        finally:
+            if log:
+                log.close()
@@ -0,0 +1,71 @@
+# Stand-in for run_benchmark.py on a board.
+# Accepts the same command line and writes the same files (measurement log,
+# power meter log, time file and TPBench-style output on stdout), filled with
+# synthetic data, so orchestrator.py can be exercised without hardware:
+#   python orchestrator.py --local /tmp/fleet --devices 1 2 3 \
+#       --command "python3 /path/to/fake_device.py --logname {logname} --benchmark {benchmark} --iterations {iterations} > results.txt"
+
+import argparse
+import random
+import time
+
+from samplelog import SampleLogWriter, open_sample_log
+
+TP_OPERATIONS = ('float ADD', 'float MAC.', 'int ADD', 'int MAC')
+
+
+def fake_iteration(out_fname, power_fname, time_fname, runtime, period, guard=0.5, idle_power=2.0, busy_power=4.0):
+    """
+    Write one iteration's logs. Timestamps are real (the function sleeps for
+    the simulated runtime) so the logs look like they were sampled live.
+    """
+    start = time.time() + guard
+    end = start + runtime
+    stop = end + guard
+    sample_log = open_sample_log(out_fname, meta={'period': period, 'fake': True})
+    power_log = SampleLogWriter(power_fname, columns=[('time', '<f8'), ('power', '<f4')])
+    now = time.time()
+    while now < stop:
+        busy = start <= now <= end
+        power = (busy_power if busy else idle_power) + random.gauss(0, 0.05)
+        power_log.append((now, power))
+        load = 0.9 if busy else 0.05
+        sample_log.append([now, power] + [0.1] * 4 + [load] * 4 + [45.0 + 10 * load] * 4 +
+                          [900000, 1100000, 300, 1700, 200000, 2000000])
+        time.sleep(period)
+        now = time.time()
+    sample_log.close()
+    power_log.close()
+    with open(time_fname, 'w') as log_file:
+        log_file.write(f"Start_time: {start}\n")
+        log_file.write(f"End time: {end}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake run_benchmark.py for orchestrator dry runs')
+    parser.add_argument('--logname', type=str, default="exp1", help='base name for the log file')
+    parser.add_argument('--benchmark', type=str, default="tp", help='which benchmark to run')
+    parser.add_argument('--iterations', type=int, default=3, help='number of iterations to run the benchmark')
+    parser.add_argument('--runtime', type=float, default=2.0, help='simulated benchmark runtime in seconds')
+    parser.add_argument('--period', type=float, default=0.05, help='sampling period in seconds')
+    args = parser.parse_args()
+
+    benchmark = args.benchmark.replace("/", "_")
+    for i in range(args.iterations):
+        base = f'{args.logname}_{i}_{benchmark}'
+        print(f"Starting iteration {i} of {args.iterations}, logging to {base}.bin", flush=True)
+        runtime = args.runtime * random.uniform(0.95, 1.05)
+        fake_iteration(f'{base}.bin', f'{base}_power.bin', f'{base}_time.txt', runtime, args.period)
+        if args.benchmark == "tp":
+            for op in TP_OPERATIONS:
+                print(f"Doing {op}\nPAPI instructions: 1000\nPAPI cycles: 2000\nIPC: 0.5\n"
+                      f"Overall throughput: 1.5e9 ops/s\nPerformed 100 ops in {runtime / 4:.6f} seconds")
+        elif args.benchmark == "bs":
+            print(f"Num of Options: 10000000\nNum of Runs: 100\n[HOOKS] Total time spent in ROI: {runtime:.3f}s")
+        elif args.benchmark == "bt":
+            print("Number of Threads : 4\n" + "Processing frame\n" * 260 + f"[HOOKS] Total time spent in ROI: {runtime:.3f}s")
+        print(f"Iteration {i + 1} benchmark runtime: {runtime} seconds", flush=True)
+
+
+if __name__ == "__main__":
+    main()
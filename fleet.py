@@ -0,0 +1,246 @@
+# Fleet deployment.
+# Copies a project folder to many boards in parallel. Only files whose content
+# hash differs from the manifest left on the board by the previous deploy are
+# sent, packed into a single tar stream per board. SSH connections are shared
+# through ControlMaster so the manifest read, the copy and any later commands
+# to the same board reuse one TCP/SSH session.
+# Transports are pluggable: SshTransport talks to real boards, LocalTransport
+# "deploys" into local directories so the whole flow can be tested offline.
+
+import glob
+import hashlib
+import io
+import json
+import os
+import subprocess
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MANIFEST_NAME = '.deploy_manifest.json'
+SKIP_NAMES = {'__pycache__', '.git', '.pytest_cache', MANIFEST_NAME}
+
+
+def fleet_devices(numbers=range(1, 36), excluded=(32,), domain="ece.utexas.edu"):
+    """
+    Host names of the boards (sld-mc1-01 ... sld-mc1-35 by default), minus the excluded numbers.
+    """
+    return [f"sld-mc1-{n:02}.{domain}" for n in numbers if n not in set(excluded)]
+
+
+def build_manifest(source_folder):
+    """
+    {relative path: sha256} of every file under source_folder, '/' separated.
+    """
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(source_folder):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_NAMES)
+        for name in sorted(filenames):
+            if name in SKIP_NAMES or name.endswith('.pyc'):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, source_folder).replace(os.sep, '/')
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            manifest[rel] = h.hexdigest()
+    return manifest
+
+
+def pack_files(source_folder, rel_paths):
+    """
+    Tar archive (bytes) of the given files, relative to source_folder.
+    """
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        for rel in rel_paths:
+            tar.add(os.path.join(source_folder, *rel.split('/')), arcname=rel)
+    return buf.getvalue()
+
+
+class SshTransport:
+    """
+    Runs ssh with a shared ControlMaster connection per board. Windows OpenSSH
+    cannot multiplex, so there every command opens its own connection.
+    """
+
+    def __init__(self, username="student", control_dir=None, connect_timeout=10, persist=300,
+                 command_timeout=300, multiplex=os.name != 'nt'):
+        self.username = username
+        self.command_timeout = command_timeout
+        self.multiplex = multiplex
+        self.options = ['-o', 'BatchMode=yes', '-o', f'ConnectTimeout={connect_timeout}']
+        if multiplex:
+            self.control_dir = control_dir or tempfile.mkdtemp(prefix='fleet-ssh-')
+            self.options += [
+                '-o', 'ControlMaster=auto',
+                '-o', f'ControlPath={os.path.join(self.control_dir, "%r@%h:%p")}',
+                '-o', f'ControlPersist={persist}',
+            ]
+
+    def _ssh(self, device, remote_command, input=None, timeout=None):
+        command = ['ssh', *self.options, f'{self.username}@{device}', remote_command]
+        return subprocess.run(command, input=input, capture_output=True,
+                              timeout=timeout or self.command_timeout, check=True)
+
+    def read_manifest(self, device, dest):
+        try:
+            result = self._ssh(device, f"cat '{dest}/{MANIFEST_NAME}' 2>/dev/null || true")
+            return json.loads(result.stdout or b'{}')
+        except ValueError:
+            return {}
+
+    def put_archive(self, device, dest, archive):
+        self._ssh(device, f"mkdir -p '{dest}' && tar -C '{dest}' -xf -", input=archive)
+
+    def write_manifest(self, device, dest, manifest):
+        self._ssh(device, f"cat > '{dest}/{MANIFEST_NAME}'", input=json.dumps(manifest).encode())
+
+    def start(self, device, remote_dir, command):
+        """
+        Start command in remote_dir without waiting for it. Returns a Popen;
+        its exit status is the remote command's.
+        """
+        return subprocess.Popen(['ssh', *self.options, f'{self.username}@{device}',
+                                 f"cd '{remote_dir}' && {command}"],
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def list_files(self, device, remote_dir, pattern):
+        """
+        {file name: (size, mtime)} of the regular files in remote_dir matching a
+        shell pattern. The mtime catches files rewritten in place at the same size.
+        """
+        result = self._ssh(device, f"find '{remote_dir}' -maxdepth 1 -type f -name '{pattern}' -printf '%f %s %T@\\n'")
+        files = {}
+        for line in result.stdout.decode(errors='replace').splitlines():
+            rest, _, mtime = line.rpartition(' ')
+            name, _, size = rest.rpartition(' ')
+            if name:
+                files[name] = (int(size), float(mtime))
+        return files
+
+    def fetch_archive(self, device, remote_dir, names):
+        """
+        Tar archive (bytes) of the named files in remote_dir.
+        """
+        quoted = ' '.join(f"'{name}'" for name in names)
+        return self._ssh(device, f"tar -C '{remote_dir}' -cf - {quoted}").stdout
+
+    def close(self, devices=()):
+        # Close the shared master connections
+        if not self.multiplex:
+            return
+        for device in devices:
+            subprocess.run(['ssh', *self.options, '-O', 'exit', f'{self.username}@{device}'],
+                           capture_output=True)
+
+
+class LocalTransport:
+    """
+    Treats <root>/<device> as the board's file system and runs "remote" commands
+    as local subprocesses there. For tests and dry runs.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, device, dest):
+        return os.path.join(self.root, device, dest.lstrip('/'))
+
+    def read_manifest(self, device, dest):
+        try:
+            with open(os.path.join(self._path(device, dest), MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def put_archive(self, device, dest, archive):
+        target = self._path(device, dest)
+        os.makedirs(target, exist_ok=True)
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(target)
+
+    def write_manifest(self, device, dest, manifest):
+        with open(os.path.join(self._path(device, dest), MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f)
+
+    def start(self, device, remote_dir, command):
+        """
+        Run command as a local subprocess inside the device directory.
+        """
+        cwd = self._path(device, remote_dir)
+        os.makedirs(cwd, exist_ok=True)
+        return subprocess.Popen(command, shell=True, cwd=cwd, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def list_files(self, device, remote_dir, pattern):
+        directory = self._path(device, remote_dir)
+        return {os.path.basename(path): (os.path.getsize(path), os.path.getmtime(path))
+                for path in glob.glob(os.path.join(glob.escape(directory), pattern)) if os.path.isfile(path)}
+
+    def fetch_archive(self, device, remote_dir, names):
+        return pack_files(self._path(device, remote_dir), names)
+
+    def close(self, devices=()):
+        pass
+
+
+class FleetDeployer:
+    """
+    Deploys source_folder to <dest_base>/<folder name> on every device, like
+    `scp -r source_folder user@device:dest_base`, but in parallel and sending
+    only changed files.
+    """
+
+    def __init__(self, transport, source_folder, dest_base="/home/student", workers=8):
+        self.transport = transport
+        self.source_folder = source_folder
+        self.dest = dest_base.rstrip('/') + '/' + os.path.basename(os.path.normpath(source_folder))
+        self.workers = workers
+
+    def deploy_device(self, device, manifest, full=False):
+        """
+        Sync one device. Returns a result dict with the files and bytes sent.
+        """
+        start = time.monotonic()
+        result = {'device': device, 'ok': False, 'files': 0, 'bytes': 0, 'seconds': 0.0, 'error': None}
+        try:
+            remote = {} if full else self.transport.read_manifest(device, self.dest)
+            changed = [rel for rel, digest in manifest.items() if remote.get(rel) != digest]
+            if changed:
+                archive = pack_files(self.source_folder, changed)
+                self.transport.put_archive(device, self.dest, archive)
+                self.transport.write_manifest(device, self.dest, manifest)
+                result['bytes'] = len(archive)
+            result.update(ok=True, files=len(changed))
+        except subprocess.TimeoutExpired:
+            result['error'] = 'timed out'
+        except subprocess.CalledProcessError as e:
+            result['error'] = (e.stderr or b'').decode(errors='replace').strip() or f'exit status {e.returncode}'
+        except OSError as e:
+            result['error'] = str(e)
+        result['seconds'] = time.monotonic() - start
+        return result
+
+    def deploy(self, devices, full=False, progress=print):
+        """
+        Sync every device in parallel. Returns the per-device results in device order.
+        """
+        manifest = build_manifest(self.source_folder)
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.deploy_device, device, manifest, full): device for device in devices}
+            for done, future in enumerate(as_completed(futures), 1):
+                r = future.result()
+                results[r['device']] = r
+                if progress is not None:
+                    if r['ok']:
+                        progress(f"[{done}/{len(devices)}] {r['device']}: {r['files']} files "
+                                 f"({r['bytes'] / 1024:.1f} kB) in {r['seconds']:.1f} s")
+                    else:
+                        progress(f"[{done}/{len(devices)}] {r['device']}: FAILED after "
+                                 f"{r['seconds']:.1f} s: {r['error']}")
+        return [results[device] for device in devices]
+
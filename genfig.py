@@ -5,6 +5,7 @@ import os
 import argparse
 import warnings
 import re
+from results_store import ResultsStore
 # Suppress FutureWarnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -33,6 +34,21 @@ def read_data_from_directories(directories, log_name):
         raise ValueError("No data files found to concatenate.")
     return pd.concat(all_data, ignore_index=True)
 
+def read_data_from_store(store_dir, log_name, benchmark, device_numbers, columns):
+    """
+    Load only the given plot columns of the selected devices from the results store.
+    Plot columns use [unit] where the store uses (unit).
+    """
+    store_names = {re.sub(r'\[(.*)\]$', r'(\1)', column): column for column in columns}
+    data = ResultsStore(store_dir).read(columns=list(store_names), benchmark=benchmark, logname=log_name)
+    if data.empty:
+        return data
+    device_ids = data['Device'].str.extract(r'(\d+)$')[0].astype(int)
+    data = data[device_ids.isin(device_numbers)].rename(columns=store_names)
+    # Plots derive the device label from the run directory name
+    data['Directory'] = data['Device']
+    return data.reset_index(drop=True)
+
 def generate_box_plots(data, columns, plot_dir):
     # Calculate the number of rows and columns needed for subplots
     benchmark = benchmark.upper()
@@ -354,6 +370,11 @@ def main():
     parser.add_argument('--benchmark', type=str, default="tp", help='Benchmark name')
     parser.add_argument('--device_numbers', type=int, nargs='+', default=[8, 9], help='List of device numbers')
     parser.add_argument('--iterations', type=int, default=1, help='Fixed iteration number')
+    parser.add_argument('--store', type=str, default='results_store', help='Results store written by DataProcessing.py')
+    parser.add_argument('--include-throttled', action='store_true',
+                        help='Keep iterations DataProcessing.py flagged as thermally throttled')
+    parser.add_argument('--include-outliers', action='store_true',
+                        help='Keep iterations run_benchmark.py --converge rejected as outliers')
     args = parser.parse_args()
 
     logname_base = args.logname
@@ -384,6 +405,14 @@ def main():
         'Energy [J]'
     ]
 
+    # Interval IPC of the hardware counters, when they were available
+    ipc_columns = [
+        'Min IPC',
+        'P5 IPC',
+        'Median IPC',
+        'Max IPC'
+    ]
+
     # Scatter plot columns
     # scatter_columns = [
     #     'Avg IPC (float ADD)',
@@ -409,20 +438,39 @@ def main():
     
 
     all_data = pd.DataFrame()
-
-    for device_number in device_numbers:
-        directory = f'{logname_base}_mc1_{device_number}_{benchmark}_{iteration}'
-        try:
-            data = read_data_from_directories([directory], logname_base)
-            all_data = pd.concat([all_data, data], ignore_index=True)
-            # generate_box_plots(data, box_plot_columns, directory)
-        except ValueError as e:
-            print(e)  # Handle the case where no data is available
+    if os.path.isdir(args.store):
+        memory_columns = ['Avg Used Memory [MB]', 'Avg Free Memory [MB]']
+        all_data = read_data_from_store(args.store, logname_base, benchmark, device_numbers,
+                                        box_plot_columns + power_columns + combinedscatter_columns + memory_columns
+                                        + ipc_columns + ['Throttled', 'Outlier'])
+
+    # Fall back to the per-device CSV directories
+    if all_data.empty:
+        for device_number in device_numbers:
+            directory = f'{logname_base}_mc1_{device_number}_{benchmark}_{iteration}'
+            try:
+                data = read_data_from_directories([directory], logname_base)
+                all_data = pd.concat([all_data, data], ignore_index=True)
+                # generate_box_plots(data, box_plot_columns, directory)
+            except ValueError as e:
+                print(e)  # Handle the case where no data is available
+
+    # Throttled iterations are outliers of the board's cooling, not of the board
+    for column, keep, option in (('Throttled', args.include_throttled, '--include-throttled'),
+                                 ('Outlier', args.include_outliers, '--include-outliers')):
+        if keep or column not in all_data.columns:
+            continue
+        flagged = all_data[column].fillna(False).astype(bool)
+        if flagged.any():
+            print(f"Leaving out {int(flagged.sum())} iterations flagged '{column}' ({option} keeps them)")
+        all_data = all_data[~flagged]
 
     if not all_data.empty:
         generate_combined_box_plots(all_data, box_plot_columns, 'plots1', logname_base, benchmark)
         generate_scatter_power_plots(all_data, power_columns, 'plots2', logname_base, benchmark)
         generate_combinedscatter_power_plots(all_data, combinedscatter_columns, 'plots3', logname_base, benchmark)
+        generate_scatter_power_plots(all_data, [c for c in ipc_columns if c in all_data and all_data[c].notna().any()],
+                                     'plots4', logname_base, 'ipc')
         # generate_scatter_plots(all_data, ipc_columns, 'plots', logname_base, 'ipc')
         # generate_scatter_plots(all_data, operation_time_columns, 'plots', logname_base, 'operation_time')
         # generate_scatter_plots(all_data, throughput_columns, 'plots', logname_base, 'throughput')
@@ -0,0 +1,250 @@
+# Fleet benchmark orchestrator.
+# Starts run_benchmark.py on many boards at once, pulls their logs back while
+# they run, and processes every board with DataProcessing as soon as it
+# finishes, adding its rows to the results store. Boards that share a power
+# meter or a rack can be put in a conflict group; at most one board of a group
+# runs at a time. The transport is the same one fleet.py deploys with, so the
+# whole flow can run locally against fake devices (see fake_device.py).
+
+import argparse
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from fleet import FleetDeployer, LocalTransport, SshTransport, fleet_devices
+from DataProcessing import process_run_directory
+from results_store import ResultsStore
+
+DEFAULT_COMMAND = ("sudo python3 run_benchmark.py --logname {logname} --benchmark {benchmark} "
+                   "--iterations {iterations} > results.txt 2>&1")
+
+
+def device_label(device):
+    """
+    mc1_08 for sld-mc1-08.ece.utexas.edu, the device part of run directory names.
+    """
+    match = re.search(r'(mc\d+)-(\d+)', device)
+    return f'{match.group(1)}_{match.group(2)}' if match else re.sub(r'\W', '_', device.split('.')[0])
+
+
+class DeviceRun:
+    """
+    State of one board during an orchestrated run.
+    """
+
+    def __init__(self, device, run_dir):
+        self.device = device
+        self.run_dir = run_dir
+        self.process = None
+        self.state = 'pending'
+        self.started = None
+        self.finished = None
+        self.returncode = None
+        self.pulled = {}
+        self.iterations_started = 0
+        self.next_pull = 0.0
+        self.processing = None
+        self.rows = 0
+        self.error = None
+
+
+class Orchestrator:
+    """
+    Runs one benchmark configuration on a list of devices.
+
+    conflict_groups maps a group name (a power meter, a rack) to the devices in it;
+    max_parallel bounds the number of boards running at once.
+    """
+
+    def __init__(self, transport, devices, logname, benchmark, iterations, remote_dir, local_root,
+                 command=DEFAULT_COMMAND, conflict_groups=None, max_parallel=None, pull_interval=30.0,
+                 poll_interval=1.0, store_dir=None, workers=None, progress=print):
+        self.transport = transport
+        self.logname = logname
+        self.benchmark = benchmark
+        self.iterations = iterations
+        self.remote_dir = remote_dir
+        self.local_root = local_root
+        self.command = command.format(logname=logname, benchmark=benchmark, iterations=iterations)
+        self.max_parallel = max_parallel or len(devices)
+        self.pull_interval = pull_interval
+        self.poll_interval = poll_interval
+        self.store_dir = store_dir
+        self.workers = workers
+        self.progress = progress
+        self.groups_of = {}
+        for group, members in (conflict_groups or {}).items():
+            for device in members:
+                self.groups_of.setdefault(device, set()).add(group)
+        self.runs = [DeviceRun(device, os.path.join(
+            local_root, f'{logname}_{device_label(device)}_{benchmark}_{iterations}')) for device in devices]
+
+    def _log(self, message):
+        if self.progress is not None:
+            self.progress(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+    def _busy_groups(self):
+        busy = set()
+        for run in self.runs:
+            if run.state == 'running':
+                busy |= self.groups_of.get(run.device, set())
+        return busy
+
+    def _start_eligible(self, pending):
+        running = sum(run.state == 'running' for run in self.runs)
+        busy = self._busy_groups()
+        for run in list(pending):
+            if running >= self.max_parallel:
+                break
+            groups = self.groups_of.get(run.device, set())
+            if groups & busy:
+                continue
+            pending.remove(run)
+            try:
+                run.process = self.transport.start(run.device, self.remote_dir, self.command)
+            except OSError as e:
+                run.state, run.error = 'failed', str(e)
+                self._log(f"{run.device}: failed to start: {e}")
+                continue
+            run.state = 'running'
+            run.started = time.monotonic()
+            running += 1
+            busy |= groups
+            self._log(f"{run.device}: started")
+
+    def pull(self, run):
+        """
+        Copy new or changed log files of this run from the device into run.run_dir.
+        Files count as changed when their size or mtime differs from the last pull,
+        since closing a binary log rewrites its fixed-size header in place.
+        """
+        pattern = f'{self.logname}_*_{self.benchmark.replace("/", "_")}*'
+        remote = self.transport.list_files(run.device, self.remote_dir, pattern)
+        results = self.transport.list_files(run.device, self.remote_dir, 'results.txt')
+        remote.update(results)
+        changed = [name for name, stat in remote.items() if run.pulled.get(name) != stat]
+        if not changed:
+            return 0
+        archive = self.transport.fetch_archive(run.device, self.remote_dir, changed)
+        os.makedirs(run.run_dir, exist_ok=True)
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(run.run_dir)
+        for name in changed:
+            run.pulled[name] = remote[name]
+        results_file = os.path.join(run.run_dir, 'results.txt')
+        if os.path.isfile(results_file):
+            with open(results_file, errors='replace') as f:
+                run.iterations_started = sum(line.startswith('Starting iteration') for line in f)
+        return len(changed)
+
+    def _check(self, run, pool):
+        now = time.monotonic()
+        returncode = run.process.poll()
+        if returncode is None and now < run.next_pull:
+            return
+        try:
+            self.pull(run)
+        except Exception as e:  # transport errors must not stop the other boards
+            self._log(f"{run.device}: pulling logs failed: {e}")
+        run.next_pull = now + self.pull_interval
+        if returncode is None:
+            self._log(f"{run.device}: iteration {run.iterations_started} of {self.iterations} "
+                      f"({now - run.started:.0f} s)")
+            return
+
+        run.finished = now
+        run.returncode = returncode
+        if returncode != 0:
+            run.state, run.error = 'failed', f'exit status {returncode}'
+            self._log(f"{run.device}: FAILED with exit status {returncode} after {now - run.started:.0f} s")
+            return
+        run.state = 'processing'
+        run.processing = pool.submit(process_run_directory, run.run_dir)
+        self._log(f"{run.device}: finished in {now - run.started:.0f} s, processing")
+
+    def _collect(self, run):
+        if not run.processing.done():
+            return
+        try:
+            rows = run.processing.result()
+        except Exception as e:  # a broken log fails this board only
+            run.state, run.error = 'failed', f'processing: {e}'
+            self._log(f"{run.device}: processing failed: {e}")
+            return
+        run.rows = len(rows)
+        if self.store_dir is not None and not rows.empty:
+            ResultsStore(self.store_dir).write(rows)
+        run.state = 'done'
+        self._log(f"{run.device}: {run.rows} iterations processed")
+
+    def run(self):
+        """
+        Run every device to completion. Returns the DeviceRun objects.
+        """
+        pending = deque(self.runs)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while any(run.state in ('pending', 'running', 'processing') for run in self.runs):
+                self._start_eligible(pending)
+                for run in self.runs:
+                    if run.state == 'running':
+                        self._check(run, pool)
+                    elif run.state == 'processing':
+                        self._collect(run)
+                time.sleep(self.poll_interval)
+        return self.runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a benchmark on many boards and collect the results')
+    parser.add_argument('--logname', type=str, default="exp1", help='base name for the log files')
+    parser.add_argument('--benchmark', type=str, default="tp", help='which benchmark to run')
+    parser.add_argument('--iterations', type=int, default=3, help='iterations per board')
+    parser.add_argument('--devices', type=int, nargs='+', default=None, help='device numbers (default: 1-35)')
+    parser.add_argument('--exclude', type=int, nargs='*', default=[32], help='device numbers to skip')
+    parser.add_argument('--user', default="student", help='remote username')
+    parser.add_argument('--remote-dir', default="/home/student/HW2", help='project folder on the boards')
+    parser.add_argument('--command', default=DEFAULT_COMMAND,
+                        help='command run in --remote-dir; {logname}, {benchmark} and {iterations} are filled in')
+    parser.add_argument('--output', default='.', help='local root for the run directories')
+    parser.add_argument('--store', default='results_store', help='results store the processed rows go to')
+    parser.add_argument('--max-parallel', type=int, default=None, help='boards running at once')
+    parser.add_argument('--groups', default=None,
+                        help='JSON file {group: [device numbers]}; boards of a group never run at the same time')
+    parser.add_argument('--pull-interval', type=float, default=30.0, help='seconds between log pulls while running')
+    parser.add_argument('--deploy', default=None, metavar='FOLDER', help='deploy this folder to the boards first')
+    parser.add_argument('--local', default=None, metavar='ROOT',
+                        help='use fake devices under ROOT/<device> instead of ssh (see fake_device.py)')
+    args = parser.parse_args()
+
+    devices = fleet_devices(args.devices or range(1, 36), excluded=args.exclude)
+    conflict_groups = {}
+    if args.groups:
+        with open(args.groups) as f:
+            conflict_groups = {group: fleet_devices(numbers, excluded=())
+                               for group, numbers in json.load(f).items()}
+
+    transport = LocalTransport(args.local) if args.local else SshTransport(args.user)
+    if args.deploy:
+        FleetDeployer(transport, args.deploy, os.path.dirname(args.remote_dir.rstrip('/'))).deploy(devices)
+
+    orchestrator = Orchestrator(transport, devices, args.logname, args.benchmark, args.iterations,
+                                args.remote_dir, args.output, command=args.command,
+                                conflict_groups=conflict_groups, max_parallel=args.max_parallel,
+                                pull_interval=args.pull_interval, store_dir=args.store)
+    runs = orchestrator.run()
+    transport.close(devices)
+
+    done = [run for run in runs if run.state == 'done']
+    print(f"{len(done)} of {len(runs)} devices completed.")
+    for run in runs:
+        if run.state != 'done':
+            print(f"  {run.device}: {run.error}")
+
+
+if __name__ == "__main__":
+    main()
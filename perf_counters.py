@@ -0,0 +1,252 @@
+# Per-process hardware counters for the measurement thread.
+# A counter probe is attached to the benchmark's PID once it has been started
+# and is read on every sampling tick like the other probes, so instructions,
+# cycles, cache misses and branch misses land in the same time-aligned log.
+# Values are cumulative counts since attach (NaN before it); IPC over any
+# interval is the ratio of the instruction and cycle deltas.
+#
+# Three backends, tried in this order by CounterProbe:
+#   PerfEventProbe - perf_event_open(2) through ctypes, one read() per counter
+#   PerfStatProbe  - `perf stat -I` running alongside, its interval output parsed
+#   NullProbe      - no counters available; every value stays NaN
+
+import ctypes
+import math
+import os
+import platform
+import shutil
+import struct
+import subprocess
+import threading
+
+COUNTER_NAMES = ('instructions', 'cycles', 'cache_misses', 'branch_misses')
+COUNTER_COLUMNS = [(name, '<f8') for name in COUNTER_NAMES]
+
+PERF_TYPE_HARDWARE = 0
+# perf_hw_id values of the counters in COUNTER_NAMES
+_HW_CONFIG = {'cycles': 0, 'instructions': 1, 'cache_misses': 3, 'branch_misses': 5}
+# Event names perf stat uses for them
+_PERF_STAT_EVENTS = {'instructions': 'instructions', 'cycles': 'cycles',
+                     'cache_misses': 'cache-misses', 'branch_misses': 'branch-misses'}
+
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1 << 0
+PERF_FORMAT_TOTAL_TIME_RUNNING = 1 << 1
+_FLAG_DISABLED = 1 << 0
+_FLAG_INHERIT = 1 << 1
+_FLAG_EXCLUDE_HV = 1 << 6
+PERF_EVENT_IOC_ENABLE = 0x2400
+
+# __NR_perf_event_open per architecture (the Exynos5422 boards run 32-bit ARM)
+_SYSCALL_NUMBERS = {'x86_64': 298, 'i386': 336, 'i686': 336, 'aarch64': 241, 'armv7l': 364, 'armv6l': 364}
+
+
+class _PerfEventAttr(ctypes.Structure):
+    # PERF_ATTR_SIZE_VER0 layout, which every kernel accepts
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('config', ctypes.c_uint64),
+        ('sample_period', ctypes.c_uint64),
+        ('sample_type', ctypes.c_uint64),
+        ('read_format', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('wakeup_events', ctypes.c_uint32),
+        ('bp_type', ctypes.c_uint32),
+        ('config1', ctypes.c_uint64),
+    ]
+
+
+class NullProbe:
+    """
+    Counter probe for systems without usable counters: all values are NaN.
+    """
+    backend = 'none'
+
+    def __init__(self, names=COUNTER_NAMES, reason=None):
+        self.names = list(names)
+        self.values = [math.nan] * len(self.names)
+        self.reason = reason
+
+    def attach(self, pid):
+        pass
+
+    def sample(self):
+        return self.values
+
+    def close(self):
+        pass
+
+
+class PerfEventProbe:
+    """
+    Opens one counting event per counter on the target PID (with inherit, so
+    threads it creates later are counted too) and reads the scaled counts on
+    every sample. Raises OSError from attach() if the kernel refuses the events.
+    """
+    backend = 'perf_event_open'
+
+    def __init__(self, names=COUNTER_NAMES):
+        self.names = list(names)
+        self.values = [math.nan] * len(self.names)
+        self._fds = []
+        self._buf = bytearray(24)
+        machine = platform.machine()
+        if machine not in _SYSCALL_NUMBERS:
+            raise OSError(f"perf_event_open syscall number unknown for {machine}")
+        self._nr = _SYSCALL_NUMBERS[machine]
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.syscall.restype = ctypes.c_long
+
+    def _open(self, config, pid):
+        attr = _PerfEventAttr()
+        attr.type = PERF_TYPE_HARDWARE
+        attr.size = ctypes.sizeof(_PerfEventAttr)
+        attr.config = config
+        attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING
+        attr.flags = _FLAG_DISABLED | _FLAG_INHERIT | _FLAG_EXCLUDE_HV
+        fd = self._libc.syscall(self._nr, ctypes.byref(attr), pid, -1, -1, 0)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"perf_event_open: {os.strerror(errno)}")
+        return fd
+
+    def attach(self, pid):
+        fds = []
+        try:
+            for name in self.names:
+                fds.append(self._open(_HW_CONFIG[name], pid))
+        except OSError:
+            for fd in fds:
+                os.close(fd)
+            raise
+        for fd in fds:
+            self._libc.ioctl(fd, PERF_EVENT_IOC_ENABLE, 0)
+        self._fds = fds
+
+    def sample(self):
+        for i, fd in enumerate(self._fds):
+            n = os.readv(fd, [self._buf])
+            if n != 24:
+                continue
+            value, enabled, running = struct.unpack_from('QQQ', self._buf)
+            # Scale up counts of events the PMU had to multiplex
+            self.values[i] = float(value) * enabled / running if running else math.nan
+        return self.values
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+
+class PerfStatProbe:
+    """
+    Runs `perf stat -I <interval> -x,` on the target PID and accumulates the
+    per-interval counts its reader thread parses, so values lag by up to one interval.
+    """
+    backend = 'perf stat'
+
+    def __init__(self, names=COUNTER_NAMES, interval=0.1, perf='perf'):
+        self.perf = shutil.which(perf)
+        if self.perf is None:
+            raise OSError("perf is not installed")
+        self.names = list(names)
+        self.values = [math.nan] * len(self.names)
+        self.interval_ms = max(10, int(interval * 1000))
+        self._totals = [math.nan] * len(self.names)
+        self._index = {_PERF_STAT_EVENTS[name]: i for i, name in enumerate(self.names)}
+        self._proc = None
+        self._thread = None
+
+    def attach(self, pid):
+        events = ','.join(_PERF_STAT_EVENTS[name] for name in self.names)
+        self._proc = subprocess.Popen([self.perf, 'stat', '-I', str(self.interval_ms), '-x', ',',
+                                       '-e', events, '-p', str(pid)],
+                                      stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.PIPE, text=True)
+        self._thread = threading.Thread(target=self._read, name="perf-stat", daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        # Lines look like "1.000123,123456,,instructions,1000000,100.00,,"
+        for line in self._proc.stderr:
+            fields = line.strip().split(',')
+            if len(fields) < 4 or fields[3] not in self._index:
+                continue
+            try:
+                count = float(fields[1])
+            except ValueError:
+                continue  # <not counted> / <not supported>
+            i = self._index[fields[3]]
+            total = self._totals[i]
+            self._totals[i] = count if math.isnan(total) else total + count
+
+    def sample(self):
+        self.values[:] = self._totals
+        return self.values
+
+    def close(self):
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.terminate()
+            self._proc.wait()
+            self._proc = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class CounterProbe:
+    """
+    Counter probe that picks its backend when it is attached: perf_event_open,
+    then perf stat, then NaN values. backend may force one of 'perf_event_open',
+    'perf' or 'none'. attach() never raises; `backend` and `reason` tell what
+    was used and why the others were skipped.
+    """
+
+    def __init__(self, names=COUNTER_NAMES, backend='auto', interval=0.1):
+        self.names = list(names)
+        self.interval = interval
+        self.choice = backend
+        self.values = [math.nan] * len(self.names)
+        self._probe = NullProbe(self.names)
+        self.backend = None
+        self.reason = None
+
+    def attach(self, pid):
+        factories = {
+            'perf_event_open': lambda: PerfEventProbe(self.names),
+            'perf': lambda: PerfStatProbe(self.names, self.interval),
+        }
+        order = list(factories) if self.choice == 'auto' else [self.choice] if self.choice in factories else []
+        reasons = []
+        for name in order:
+            try:
+                probe = factories[name]()
+                probe.attach(pid)
+            except OSError as e:
+                reasons.append(f"{name}: {e}")
+                continue
+            self._probe = probe
+            break
+        else:
+            self._probe = NullProbe(self.names, '; '.join(reasons) or 'disabled')
+        self.values = self._probe.values
+        self.backend = self._probe.backend
+        self.reason = '; '.join(reasons) or None
+
+    @property
+    def columns(self):
+        return [(name, '<f8') for name in self.names]
+
+    def sample(self):
+        return self._probe.sample()
+
+    def close(self):
+        self._probe.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
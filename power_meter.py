@@ -0,0 +1,262 @@
+# Power meter client.
+# The meter at 192.168.4.1 streams one CSV line per reading over a telnet port,
+# with the total power in watts as the second to last field. The client reads
+# the stream on its own thread over a raw socket, timestamps every complete line
+# as it arrives and stores it in a ring buffer, so no reading is dropped between
+# sampling ticks. FakePowerMeter serves the same stream locally for testing.
+
+import socket
+import threading
+import time
+import numpy as np
+from scheduler import wall_time
+
+# Telnet protocol bytes
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+
+
+class SampleRing:
+    """
+    Fixed capacity buffer of (timestamp, value) pairs for one writer thread and
+    any number of reader threads. The writer fills a slot and only then publishes
+    it by advancing `written`; readers copy what they need and re-check `written`
+    to detect slots that were overwritten while they were copying. No locks are
+    taken on either side.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.written = 0
+
+    def append(self, timestamp, value):
+        i = self.written % self.capacity
+        self.times[i] = timestamp
+        self.values[i] = value
+        self.written += 1
+
+    def latest(self, default=None):
+        """
+        Most recent value, or default if nothing was received yet.
+        """
+        n = self.written
+        if n == 0:
+            return default
+        return float(self.values[(n - 1) % self.capacity])
+
+    def snapshot(self):
+        """
+        Copy of everything still held by the buffer, oldest first, as (times, values).
+        """
+        while True:
+            n = self.written
+            count = min(n, self.capacity)
+            idx = np.arange(n - count, n) % self.capacity
+            times = self.times[idx]
+            values = self.values[idx]
+            # Slots overwritten during the copy are the oldest ones; drop them
+            lost = max(0, self.written - n - (self.capacity - count))
+            if lost < count:
+                return times[lost:], values[lost:]
+
+    def between(self, t_start, t_end):
+        """
+        Readings with t_start <= timestamp < t_end, as (times, values).
+        """
+        times, values = self.snapshot()
+        lo, hi = np.searchsorted(times, [t_start, t_end])
+        return times[lo:hi], values[lo:hi]
+
+
+class PowerMeterClient:
+    """
+    Reads the power meter stream on a background thread. Every complete line is
+    stored in `readings` with its arrival time, and optionally appended to `sink`
+    (e.g. a samplelog.SampleLogWriter with time/power columns).
+    """
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, host="192.168.4.1", port=23, sink=None, capacity=1 << 16, timeout=0.5):
+        self.host = host
+        self.port = port
+        self.sink = sink
+        self.timeout = timeout
+        self.readings = SampleRing(capacity)
+        self.lines = 0
+        self.bad_lines = 0
+        self.error = None
+        # CPU time the reader thread used, the cost of polling the meter
+        self.cpu_ns = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="power-meter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def latest(self, default=None):
+        return self.readings.latest(default)
+
+    def between(self, t_start, t_end):
+        return self.readings.between(t_start, t_end)
+
+    def _run(self):
+        cpu = time.thread_time_ns()
+        try:
+            while not self._stop.is_set():
+                try:
+                    with socket.create_connection((self.host, self.port), timeout=self.timeout) as conn:
+                        self.error = None
+                        self._read_stream(conn)
+                except OSError as e:
+                    self.error = e
+                    self._stop.wait(self.RECONNECT_DELAY)
+        finally:
+            self.cpu_ns += time.thread_time_ns() - cpu
+
+    def _read_stream(self, conn):
+        pending = b''
+        while not self._stop.is_set():
+            try:
+                chunk = conn.recv(4096)
+            except socket.timeout:
+                continue
+            if not chunk:
+                raise ConnectionError("power meter closed the connection")
+            now = wall_time()
+            data = pending + self._strip_telnet(conn, chunk)
+            lines = data.split(b'\n')
+            # The last element is an incomplete line (or empty); keep it for the next chunk
+            pending = lines.pop()
+            for line in lines:
+                self._handle_line(now, line)
+
+    def _handle_line(self, timestamp, line):
+        fields = line.strip().split(b',')
+        if len(fields) < 2:
+            return
+        try:
+            power = float(fields[-2])
+        except ValueError:
+            self.bad_lines += 1
+            return
+        self.lines += 1
+        self.readings.append(timestamp, power)
+        if self.sink is not None:
+            self.sink.append((timestamp, power))
+
+    @staticmethod
+    def _strip_telnet(conn, chunk):
+        """
+        Remove telnet negotiation from chunk, refusing every option like telnetlib does.
+        Assumes a negotiation sequence is not split across recv() calls.
+        """
+        if IAC not in chunk:
+            return chunk
+        out = bytearray()
+        i = 0
+        while i < len(chunk):
+            b = chunk[i]
+            if b != IAC or i + 1 >= len(chunk):
+                out.append(b)
+                i += 1
+                continue
+            cmd = chunk[i + 1]
+            if cmd in (DO, DONT, WILL, WONT) and i + 2 < len(chunk):
+                if cmd in (DO, WILL):
+                    conn.sendall(bytes([IAC, WONT if cmd == DO else DONT, chunk[i + 2]]))
+                i += 3
+            elif cmd == SB:
+                end = chunk.find(bytes([IAC, SE]), i + 2)
+                i = len(chunk) if end == -1 else end + 2
+            elif cmd == IAC:
+                out.append(IAC)
+                i += 2
+            else:
+                i += 2
+        return bytes(out)
+
+
+class FakePowerMeter:
+    """
+    Local stand-in for the power meter. Streams `volts,amps,watts,watt_hours`
+    lines at `rate` Hz to every client; power_fn(t) gives watts at time t.
+    Lines are deliberately split across writes to exercise partial line handling.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, rate=1000, power_fn=None, volts=5.0):
+        self.rate = rate
+        self.volts = volts
+        self.power_fn = power_fn or (lambda t: 2.5)
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        t = threading.Thread(target=self._accept, name="fake-power-meter", daemon=True)
+        t.start()
+        self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._server.close()
+        for t in self._threads:
+            t.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept(self):
+        self._server.settimeout(0.2)
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            t = threading.Thread(target=self._serve, args=(conn,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _serve(self, conn):
+        period = 1.0 / self.rate
+        energy_wh = 0.0
+        next_time = time.monotonic()
+        with conn:
+            try:
+                # Option negotiation a real telnet server would send first
+                conn.sendall(bytes([IAC, DO, 24, IAC, WILL, 1]))
+                while not self._stop.is_set():
+                    watts = self.power_fn(wall_time())
+                    energy_wh += watts * period / 3600
+                    line = f"{self.volts:.3f},{watts / self.volts:.4f},{watts:.4f},{energy_wh:.6f}\r\n".encode()
+                    half = len(line) // 2
+                    conn.sendall(line[:half])
+                    conn.sendall(line[half:])
+                    next_time += period
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+            except OSError:
+                pass
@@ -0,0 +1,99 @@
+# On-disk cache of per-iteration analysis results.
+# Entries are keyed by a hash of the raw files an iteration was computed from
+# together with the analysis version, so editing or re-copying a log, or
+# changing the analysis, invalidates exactly the affected entries. Each entry is
+# one small JSON file; a hit refreshes its mtime, and prune() evicts the least
+# recently used entries once the cache grows beyond its size limit.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def hash_files(paths, version):
+    """
+    Content hash of the given files (missing ones count as absent) and version.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'analysis-version:{version}\n'.encode())
+    for path in paths:
+        h.update(os.path.basename(path).encode())
+        if not os.path.isfile(path):
+            h.update(b'\0missing\0')
+            continue
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in the result cache")
+
+
+class ResultCache:
+    """
+    Directory of cached result rows with size-bounded LRU eviction.
+    Safe to use from several worker processes at once: entries are written to a
+    temporary file and renamed into place.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """
+        Cached value for key, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(value, f, default=_to_json)
+        os.replace(tmp, path)
+
+    def prune(self):
+        """
+        Evict least recently used entries until the cache fits in max_bytes.
+        Returns the number of evicted entries.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
@@ -0,0 +1,91 @@
+# Columnar results store.
+# One Parquet file per (benchmark, device, iteration, logname), laid out as a
+# hive-partitioned dataset:
+#   <root>/Benchmark=tp/Device=mc1_08/Iteration=0/<logname>.parquet
+# Writers replace only the partitions they write, so devices and iterations can
+# be added or reprocessed independently. Readers load just the columns and
+# partitions they ask for. Requires pyarrow.
+
+import os
+
+import pandas as pd
+
+PARTITION_COLUMNS = ('Benchmark', 'Device', 'Iteration')
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The results store needs pyarrow (pip install pyarrow)") from e
+    return pa, ds, pq
+
+
+class ResultsStore:
+    """
+    Typed, partitioned store of per-iteration result rows.
+    Rows need Benchmark, Device, Iteration and Logname columns.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _partition_dir(self, benchmark, device, iteration):
+        return os.path.join(self.root, f'Benchmark={benchmark}', f'Device={device}', f'Iteration={int(iteration)}')
+
+    def write(self, rows):
+        """
+        Write a DataFrame (or list of row dicts), replacing the partitions it covers.
+        """
+        pa, _, pq = _pyarrow()
+        df = pd.DataFrame(rows)
+        missing = [c for c in PARTITION_COLUMNS + ('Logname',) if c not in df.columns]
+        if missing:
+            raise ValueError(f"Result rows are missing columns {missing}")
+        for (benchmark, device, iteration, logname), part in df.groupby(list(PARTITION_COLUMNS) + ['Logname']):
+            directory = self._partition_dir(benchmark, device, iteration)
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pandas(part.drop(columns=list(PARTITION_COLUMNS)), preserve_index=False)
+            path = os.path.join(directory, f'{logname}.parquet')
+            tmp = f'{path}.{os.getpid()}.tmp'
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+
+    def read(self, columns=None, benchmark=None, devices=None, logname=None):
+        """
+        Load the store as a DataFrame. columns limits the columns read from disk
+        (partition columns are always included); benchmark, devices and logname
+        select partitions/rows.
+        """
+        pa, ds, _ = _pyarrow()
+        if not os.path.isdir(self.root):
+            return pd.DataFrame()
+        partitioning = ds.partitioning(pa.schema([('Benchmark', pa.string()),
+                                                  ('Device', pa.string()),
+                                                  ('Iteration', pa.int32())]), flavor='hive')
+        dataset = ds.dataset(self.root, format='parquet', partitioning=partitioning,
+                             exclude_invalid_files=True)
+        # Benchmarks contribute different columns; read with the union of all file schemas
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if not schemas:
+            return pd.DataFrame()
+        schema = pa.unify_schemas(schemas + [partitioning.schema], promote_options='permissive')
+        dataset = ds.dataset(self.root, schema=schema, format='parquet', partitioning=partitioning,
+                             exclude_invalid_files=True)
+        names = set(dataset.schema.names)
+        if columns is not None:
+            columns = list(PARTITION_COLUMNS) + ['Logname'] + [c for c in columns if c in names]
+            columns = list(dict.fromkeys(columns))
+
+        condition = None
+        for field, values in (('Benchmark', benchmark), ('Device', devices), ('Logname', logname)):
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            term = ds.field(field).isin(values)
+            condition = term if condition is None else condition & term
+
+        table = dataset.to_table(columns=columns, filter=condition)
+        return table.to_pandas().sort_values(list(PARTITION_COLUMNS)).reset_index(drop=True)
@@ -1,5 +1,5 @@
-import os
-import subprocess
+import argparse
+from fleet import FleetDeployer, LocalTransport, SshTransport, fleet_devices
 
 # Folder to be copied
 source_folder = r"C:\Users\13462\Downloads\HW2"
@@ -10,25 +10,37 @@ username = "student"
 # List of device numbers to exclude
 excluded_devices = {32}
 
-# SCP function to copy the folder
-def scp_to_device(device_str, source_folder, destination_path):
-    scp_command = ["scp", "-r", source_folder, destination_path]
-    try:
-        result = subprocess.run(scp_command, check=True, text=True, capture_output=True)
-        print(f"Successfully copied to {device_str}")
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to copy to {device_str}: {e.stderr}")
-
-for device_num in range(1, 36):
-    if device_num in excluded_devices:
-        continue
-    # Format device number to two digits
-    device_str = f"{device_num:02}"
-    # Construct the remote device address and destination path
-    remote_device = f"sld-mc1-{device_str}.ece.utexas.edu"
-    destination_path = f"{username}@{remote_device}:{destination_base}"
-    
-    # Copy the folder to the remote device
-    scp_to_device(remote_device, source_folder, destination_path)
-
-print("All operations completed.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy the project folder to every board in the fleet')
+    parser.add_argument('--source', default=source_folder, help='folder to copy')
+    parser.add_argument('--dest', default=destination_base, help='destination base path on the devices')
+    parser.add_argument('--user', default=username, help='remote username')
+    parser.add_argument('--devices', type=int, nargs='+', default=None,
+                        help='device numbers to deploy to (default: 1-35)')
+    parser.add_argument('--exclude', type=int, nargs='*', default=sorted(excluded_devices),
+                        help='device numbers to skip')
+    parser.add_argument('--workers', type=int, default=8, help='devices copied to at once')
+    parser.add_argument('--full', action='store_true', help='send every file, not only the changed ones')
+    parser.add_argument('--local', default=None, metavar='ROOT',
+                        help='deploy into ROOT/<device> instead of over ssh (for testing)')
+    args = parser.parse_args()
+
+    devices = fleet_devices(args.devices or range(1, 36), excluded=args.exclude)
+
+    transport = LocalTransport(args.local) if args.local else SshTransport(args.user)
+    deployer = FleetDeployer(transport, args.source, args.dest, workers=args.workers)
+    results = deployer.deploy(devices, full=args.full)
+    transport.close(devices)
+
+    failed = [r['device'] for r in results if not r['ok']]
+    slowest = max(results, key=lambda r: r['seconds'], default=None)
+    print(f"Deployed to {len(results) - len(failed)} of {len(results)} devices"
+          + (f", slowest {slowest['device']} ({slowest['seconds']:.1f} s)" if slowest else ""))
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    print("All operations completed.")
+
+
+if __name__ == "__main__":
+    main()
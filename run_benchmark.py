@@ -8,9 +8,20 @@ import subprocess
 import threading 
 import socket 
 import psutil
-import telnetlib as tel
 import numpy as np
 import logging
+import os
+import json
+from sampler import SysfsSampler, MeminfoProbe, NODE_GROUPS, default_nodes, thermal_zone_types, cooling_device_types
+from samplelog import open_sample_log, read_samples, SampleLogWriter
+from power_meter import PowerMeterClient
+from scheduler import DeadlineScheduler, wall_time
+from cooldown import CooldownController
+from convergence import ConvergenceTracker, window_energy
+from perf_counters import CounterProbe
+from streaming_stats import StatsServer, StreamingStats
+from telemetry import TelemetryServer
+from benchmarks import BENCHMARKS, BENCHMARK_ROOT, get_benchmark, parse_placements
 
 
 #command line: 
@@ -50,22 +61,21 @@ def set_cluster_freq(cluster_num, frequency):
     with open(sysfs.fn_cluster_freq_set.format(cluster_num), 'w') as f:
         f.write(str(frequency))
 
-def get_telnet_power(telnet_connection, last_power):
+def apply_frequency_point(big_freq, little_freq, retries=10, delay=0.1):
     """
-    Read power values using telnet.
+    Set both cluster frequencies (khz) and check through get_cluster_freq that they took effect.
+    Returns the frequencies read back; raises RuntimeError if they never match.
     """
-    # Get the latest data available from the telnet connection without blocking
-    tel_dat = str(telnet_connection.read_very_eager())
-    # Find the latest power measurement in the data
-    idx = tel_dat.rfind('\n')
-    idx2 = tel_dat[:idx].rfind('\n')
-    idx2 = idx2 if idx2 != -1 else 0
-    ln = tel_dat[idx2:idx].strip().split(',')
-    if len(ln) < 2:
-        total_power = last_power
-    else:
-        total_power = float(ln[-2])
-    return total_power
+    set_user_space()
+    for attempt in range(retries):
+        set_cluster_freq(4, big_freq)
+        set_cluster_freq(0, little_freq)
+        current = (get_cluster_freq(4), get_cluster_freq(0))
+        if current == (big_freq, little_freq):
+            return current
+        time.sleep(delay)
+    raise RuntimeError(f"Cluster frequencies stuck at big {current[0]} / little {current[1]} khz, "
+                       f"requested {big_freq} / {little_freq} khz")
 
 def get_cpu_load():
     """
@@ -90,6 +100,14 @@ def get_temps():
     templ[3] = t1
     return templ
 
+def get_idle_power(meter, window=1.0):
+    """
+    Mean power over the last `window` seconds of meter readings, None without readings
+    """
+    now = wall_time()
+    _, values = meter.between(now - window, now)
+    return float(values.mean()) if len(values) else None
+
 def get_micro_volts(voltage_path):
     with open(voltage_path, 'r') as f:
         return int(f.read().strip())
@@ -100,170 +118,483 @@ def get_core_freq(core_num):
 
 
 def get_little_micro_volts():
-    little_cluster_voltage_base = "/sys/devices/platform/pwrseq/subsystem/devices/s2mps11-regulator/regulator/regulator.44/"
-    little_micro_volts = little_cluster_voltage_base + "microvolts"
-    return get_micro_volts(little_micro_volts)
+    return get_micro_volts(sysfs.little_micro_volts)
 
 def get_big_micro_volts():
-    big_cluster_voltage_base = "/sys/devices/platform/pwrseq/subsystem/devices/s2mps11-regulator/regulator/regulator.40/"
-    big_micro_volts = big_cluster_voltage_base + "microvolts"
-    return get_micro_volts(big_micro_volts)
-
-
-def get_memory_usage():
-    output = subprocess.check_output(['free', '-m']).decode('utf-8')
-    lines = output.splitlines()
-    if len(lines) >= 2:
-        # Extract and return used and free memory values
-        fields = lines[1].split()
-        if len(fields) >= 7:
-            used_memory = int(fields[2])
-            free_memory = int(fields[3])
-            return used_memory, free_memory
-    return None, None
+    return get_micro_volts(sysfs.big_micro_volts)
 
-measurement_started_event = threading.Event()
 
-def run_measurement(out_fname, stop_event):
-    header = "time\tpower\tusage_c0\tusage_c1\tusage_c2\tusage_c3\tusage_c4\tusage_c5\tusage_c6\tusage_c7\ttemp4\ttemp5\ttemp6\ttemp7\tlittle_micro_volts\tbig_micro_volts\tused_memory\tfree_memory\tlittle_core_freq\tbig_core_freq"
-    out_file = open(out_fname, 'w')
-    out_file.write(header)
-    out_file.write("\n")
+measurement_started_event = threading.Event()
+# Exceptions of failed measurement threads, for the main thread to re-raise
+measurement_errors = []
 
-    telnet_connection = tel.Telnet("192.168.4.1")
-    total_power = 0.0
-    measurement_started_event.set() 
-    while not stop_event.is_set():
-        last_time = time.time()
+def run_measurement(out_fname, stop_event, period=0.2, probe_periods=None, counters=None,
+                    sysfs_groups=NODE_GROUPS, stats=None, telemetry=None):
+    """
+    Sample power, CPU load, sysfs nodes and memory until stop_event is set.
+    period is the default sampling period in seconds; probe_periods overrides it
+    per probe ('power', 'usage', 'sysfs', 'memory', 'counters'). A record is written
+    every time the fastest probe runs, holding the latest value of every column.
+    counters, when given, is a CounterProbe the benchmark gets attached to; its
+    cumulative counts are logged too (NaN until it is attached). sysfs_groups
+    selects the sysfs node groups; the log columns follow from the enabled probes.
+    stats, when given, is a StreamingStats every record is added to as it is logged,
+    and telemetry a TelemetryServer every record is streamed to.
+    """
+    probe_periods = dict(probe_periods or {})
+    record_period = min([period] + list(probe_periods.values()))
 
+    def sample_power():
         # System power
-        total_power = get_telnet_power(telnet_connection, total_power)
-    
-        # CPU load
-        usages = get_cpu_load()
+        record[power_idx] = power_meter.latest(record[power_idx])
 
-        # Temperature for big cores
-        temps = get_temps()
+    def sample_usage():
+        # CPU load
+        for i, usage in zip(usage_idx, get_cpu_load()):
+            record[i] = usage
 
-        # Big cluster core frequency
-        big_core_freqs = 2000000
-      
-        # Little cluster core frequency
-        little_core_freqs = 200000
-    
-        # Micro volts for little and big clusters
-        little_mv = get_little_micro_volts()
-        big_mv = get_big_micro_volts()
+    def sample_sysfs():
+        # Temperatures, rail voltages, core/cluster/GPU frequencies and throttling state
+        for i, value in zip(sysfs_idx, sysfs_sampler.sample()):
+            record[i] = value
 
+    def sample_memory():
         # Memory usage
-        used_memory, free_memory = get_memory_usage()
-    
-        # Timestamp
-        time_stamp = last_time
+        for i, value in zip(memory_idx, meminfo_probe.sample()):
+            record[i] = value
+
+    def sample_counters():
+        # Hardware counters of the benchmark process
+        for i, value in zip(counter_idx, counters.sample()):
+            record[i] = value
+
+    def write_record():
+        # Timestamp and data write out
+        record[0] = wall_time()
+        sample_log.append(record)
+        if stats is not None:
+            stats.update(record)
+        if telemetry is not None:
+            telemetry.publish(record)
+
+    # Probes are registered before anything is opened, so a bad period fails cleanly.
+    # Every probe run is timed, so the sampler's own cost ends up in the log header
+    scheduler = DeadlineScheduler(profile=True)
+    scheduler.add('power', probe_periods.get('power', period), sample_power)
+    scheduler.add('usage', probe_periods.get('usage', period), sample_usage)
+    scheduler.add('sysfs', probe_periods.get('sysfs', period), sample_sysfs)
+    scheduler.add('memory', probe_periods.get('memory', period), sample_memory)
+    if counters is not None:
+        scheduler.add('counters', probe_periods.get('counters', period), sample_counters)
+    scheduler.add('record', record_period, write_record)
+
+    sysfs_sampler = meminfo_probe = sample_log = power_log = power_meter = None
+    try:
+        # Thermal, voltage, frequency and throttling nodes stay open for the whole run
+        sysfs_sampler = SysfsSampler(default_nodes(sysfs_groups), skip_missing=True)
+        # Memory usage is parsed from /proc/meminfo instead of forking `free -m`
+        meminfo_probe = MeminfoProbe(('used_memory', 'free_memory'))
+        columns = ([('time', '<f8'), ('power', '<f4')] + [(f'usage_c{c}', '<f4') for c in range(8)]
+                   + sysfs_sampler.columns + meminfo_probe.columns
+                   + (counters.columns if counters is not None else []))
+        # Binary logs for .bin file names, tab separated text otherwise
+        sample_log = open_sample_log(out_fname, columns, meta={
+            'period': record_period, 'probe_periods': probe_periods, 'sysfs_groups': list(sysfs_groups),
+            'missing_nodes': sysfs_sampler.missing, 'thermal_zones': thermal_zone_types(),
+            'cooling_devices': cooling_device_types()})
+        col = {name: i for i, name in enumerate(sample_log.names)}
+        if stats is not None:
+            stats.bind(sample_log.names)
+        if telemetry is not None:
+            telemetry.begin(columns, log=out_fname, period=record_period)
+        record = [0] * len(sample_log.names)
+        counter_idx = [col[name] for name in counters.names] if counters is not None else []
+        for i in counter_idx:
+            record[i] = float('nan')
+
+        power_idx = col['power']
+        usage_idx = [col[f'usage_c{c}'] for c in range(8)]
+        sysfs_idx = [col[name] for name in sysfs_sampler.names]
+        memory_idx = [col[name] for name in meminfo_probe.names]
+
+        # Every reading the meter sends is timestamped and kept in a side log
+        power_log = SampleLogWriter(os.path.splitext(out_fname)[0] + '_power.bin',
+                                    columns=[('time', '<f8'), ('power', '<f4')])
+        power_meter = PowerMeterClient("192.168.4.1", sink=power_log).start()
+
+        measurement_started_event.set()
+        scheduler.run(stop_event)
+    finally:
+        # Whatever was opened is closed, also when the setup or a probe fails, so the
+        # logs are complete up to the failure
+        if power_meter is not None:
+            power_meter.stop()
+        if power_log is not None:
+            power_log.close()
+        if sysfs_sampler is not None:
+            sysfs_sampler.close()
+        if meminfo_probe is not None:
+            meminfo_probe.close()
+        if sample_log is not None:
+            self_profile = scheduler.profile_stats()
+            if power_meter is not None:
+                self_profile['power_meter_cpu_s'] = power_meter.cpu_ns / 1e9
+            sample_log.update_meta(scheduler=scheduler.stats(), self_profile=self_profile)
+            if counters is not None:
+                sample_log.update_meta(counters={'backend': counters.backend, 'reason': counters.reason})
+            sample_log.close()
+    if meminfo_probe.over_budget:
+        print(f"Memory probe exceeded its budget on {meminfo_probe.over_budget} of {meminfo_probe.ticks} samples")
+    missed = {name: st['missed_deadlines'] for name, st in scheduler.stats().items() if st['missed_deadlines']}
+    if missed:
+        print(f"Missed sampling deadlines: {missed}")
+    profile = scheduler.profile_stats()
+    if profile['cpu_share'] is not None:
+        print(f"Sampling thread used {profile['cpu_share']:.1%} of a core "
+              f"({profile['thread_cpu_s']:.2f} s CPU in {profile['elapsed_s']:.1f} s)")
+
+
+def measurement_thread(*args):
+    """
+    Thread target running run_measurement(*args). An exception is kept in
+    measurement_errors, and measurement_started_event is set even if the
+    measurement failed before starting, so the main thread never waits for it forever.
+    """
+    try:
+        run_measurement(*args)
+    except Exception as e:
+        measurement_errors.append(e)
+        raise
+    finally:
+        measurement_started_event.set()
 
-        # Data write out:
-        fmt_str = "{}\t" * 20  # Adjusted for 27 fields now
-        out_ln = fmt_str.format(time_stamp, total_power, usages[0], usages[1], usages[2], usages[3], usages[4], usages[5],
-                                usages[6], usages[7], temps[0], temps[1], temps[2], temps[3], little_mv, big_mv,
-                                used_memory, free_memory, little_core_freqs, big_core_freqs)
 
-        out_file.write(out_ln)
-        out_file.write("\n")
+def check_measurement():
+    """
+    Re-raise the failure of the last measurement thread, if any.
+    """
+    if measurement_errors:
+        raise RuntimeError("Measurement thread failed") from measurement_errors.pop()
 
-        # Sleep to maintain sampling rate
-        elapsed = time.time() - last_time
-        DELAY = 0.2  # sample every 200 ms
-        time.sleep(max(0., DELAY - elapsed))
+
+def calibrate_sampler(base, duration, periods, sysfs_groups=NODE_GROUPS):
+    """
+    Cost of the measurement itself, with no benchmark running: mean power and CPU
+    usage over `duration` seconds with only the power meter being read, then with
+    run_measurement sampling at each of the periods. Returns one dict per phase,
+    the sampled ones with their overhead over the first.
+    """
+    meter = PowerMeterClient("192.168.4.1").start()
+    psutil.cpu_percent(interval=None)
+    time.sleep(duration)
+    idle = {'period': None, 'power': get_idle_power(meter, duration), 'cpu_percent': psutil.cpu_percent(interval=None)}
+    meter.stop()
+    results = [idle]
+    for period in periods:
+        out_fname = f'{base}_{period:g}.bin'
+        stop_event = threading.Event()
+        thread = threading.Thread(target=measurement_thread, args=(out_fname, stop_event, period, {}, None, sysfs_groups))
+        thread.start()
+        measurement_started_event.wait()
+        check_measurement()
+        psutil.cpu_percent(interval=None)
+        time.sleep(duration)
+        cpu_percent = psutil.cpu_percent(interval=None)
+        stop_event.set()
+        thread.join()
+        measurement_started_event.clear()
+        check_measurement()
+
+        meter_log, _ = read_samples(os.path.splitext(out_fname)[0] + '_power.bin')
+        _, meta = read_samples(out_fname)
+        power = float(meter_log['power'].mean()) if len(meter_log) else None
+        results.append({
+            'period': period,
+            'power': power,
+            'cpu_percent': cpu_percent,
+            'power_overhead': power - idle['power'] if power is not None and idle['power'] is not None else None,
+            'cpu_overhead_percent': cpu_percent - idle['cpu_percent'],
+            'self_profile': meta['self_profile'],
+            'probes': {name: {key: st[key] for key in ('runs', 'missed_deadlines', 'mean_wall_us', 'mean_cpu_us',
+                                                       'max_wall_us', 'net_live_blocks')}
+                       for name, st in meta['scheduler'].items()},
+        })
+    return results
 
 
 #run_benchmark 
 parser = argparse.ArgumentParser(description='ECE361E HW2 - benchmark_run')  
 parser.add_argument('--logname', type=str, default="exp1", help='base name for the log file')         
-parser.add_argument('--benchmark', type=str, default="tp", help='which benchmark to run')
-parser.add_argument('--iterations', type=int, default=3, help='number of iterations to run the benchmark')
+parser.add_argument('--benchmark', type=str, default="tp", choices=sorted(BENCHMARKS), help='which benchmark to run')
+parser.add_argument('--threads', type=int, default=None, help='benchmark threads (default: from the benchmark definition)')
+parser.add_argument('--affinity', type=lambda mask: int(mask, 0), default=None,
+                    help='CPU affinity mask, e.g. 0xF0 for cores 7654 (default: from the benchmark definition)')
+parser.add_argument('--placements', nargs='+', default=None, metavar='MASK[:THREADS]',
+                    help='placement sweep: run --iterations iterations per affinity mask/thread count, '
+                         'e.g. 0x10:1 0x30:2, or big, little, mixed for 1-4 cores of each kind')
+parser.add_argument('--input', type=str, default=None, help='input set of the benchmark')
+parser.add_argument('--benchmark-root', type=str, default=BENCHMARK_ROOT, help='where the benchmark binaries live')
+parser.add_argument('--iterations', type=int, default=3,
+                    help='number of iterations to run the benchmark (the minimum with --converge)')
+parser.add_argument('--converge', type=float, default=None, metavar='TARGET',
+                    help='run every point until the 95%% confidence intervals of runtime and energy are within '
+                         '± TARGET of the mean, e.g. 0.01, re-running outlier iterations')
+parser.add_argument('--max-iterations', type=int, default=20, help='most iterations per point with --converge')
+parser.add_argument('--outlier-threshold', type=float, default=3.5,
+                    help='robust z-score above which --converge re-runs an iteration')
 parser.add_argument('--host', default="127.0.0.1", help='IP address of the device')
-parser.add_argument('--port', type=int, default=10001, help='Port for the device to listen on')
+parser.add_argument('--port', type=int, default=10001,
+                    help='Port for the device to listen on; subscribers get the live samples (see telemetry.py)')
+parser.add_argument('--log-format', choices=['bin', 'txt'], default='bin', help='binary or tab separated measurement log')
+parser.add_argument('--period', type=float, default=0.2, help='sampling period in seconds')
+parser.add_argument('--probe-period', action='append', default=[], metavar='PROBE=SECONDS',
+                    help='sampling period for one probe (power, usage, sysfs, memory, counters), e.g. power=0.001')
+parser.add_argument('--sysfs-groups', nargs='+', choices=NODE_GROUPS, default=list(NODE_GROUPS),
+                    help='sysfs node groups to log (default: all)')
+parser.add_argument('--counters', choices=['auto', 'perf_event_open', 'perf', 'off'], default='auto',
+                    help='hardware counters of the benchmark process: perf_event_open, perf stat, or whichever works')
+parser.add_argument('--big-freq', type=int, default=2000000, help='big cluster frequency in khz')
+parser.add_argument('--little-freq', type=int, default=200000, help='little cluster frequency in khz')
+parser.add_argument('--sweep', action='store_true',
+                    help='run --iterations iterations at every (big, little) frequency pair')
+parser.add_argument('--big-freqs', type=int, nargs='+', default=None,
+                    help='big cluster frequencies for --sweep in khz (default: all available)')
+parser.add_argument('--little-freqs', type=int, nargs='+', default=None,
+                    help='little cluster frequencies for --sweep in khz (default: all available)')
+parser.add_argument('--stats-port', type=int, default=None,
+                    help='serve running statistics of the current iteration as JSON on 127.0.0.1:PORT')
+parser.add_argument('--calibrate', type=float, default=None, metavar='SECONDS',
+                    help='run no benchmark; measure the power and CPU cost of the sampler itself for SECONDS '
+                         'per sampling period and write {logname}_calibration.json')
+parser.add_argument('--calibrate-periods', type=float, nargs='+', default=None,
+                    help='sampling periods --calibrate measures (default: --period)')
+parser.add_argument('--guard', type=float, default=2.0, help='idle seconds logged before and after the benchmark')
+parser.add_argument('--cooldown', choices=['adaptive', 'fixed'], default='adaptive',
+                    help='wait for temperatures/power to return to the pre-run baseline, or sleep --cooldown-timeout')
+parser.add_argument('--cooldown-timeout', type=float, default=120.0, help='longest cooldown between iterations in seconds')
+parser.add_argument('--temp-tolerance', type=float, default=2.0, help='cooldown tolerance above baseline temperatures in C')
+parser.add_argument('--power-tolerance', type=float, default=0.2, help='cooldown tolerance above baseline idle power in W')
 args = parser.parse_args()
 logname_base = args.logname
 benchmark = args.benchmark
 iterations = args.iterations
 host = args.host
 port = args.port
-
-
-
-for i in range(iterations):
-        print('Available freqs for big cluster:', get_avail_freqs(4))
-        print('Available freqs for LITTLE cluster:', get_avail_freqs(0))
-        set_user_space()
-
-        set_cluster_freq(4, 2000000)   # big cluster --> 2 GHz
-        set_cluster_freq(0, 200000)    # little cluster --> 0.2 GHz
+log_ext = args.log_format
+period = args.period
+probe_periods = {}
+for spec in args.probe_period:
+    name, _, value = spec.partition('=')
+    if name not in ('power', 'usage', 'sysfs', 'memory', 'counters'):
+        parser.error(f"unknown probe in --probe-period: {name}")
+    probe_periods[name] = float(value)
+guard = args.guard
+definition = get_benchmark(benchmark)
+if args.threads is not None and args.threads < 1:
+    parser.error(f"--threads must be at least 1, got {args.threads}")
+try:
+    if args.placements:
+        placements = parse_placements(args.placements,
+                                      definition.threads if definition.fixed_threads else None)
+    else:
+        placements = [(definition.affinity if args.affinity is None else args.affinity,
+                       args.threads if args.threads is not None else definition.threads)]
+    commands = {placement: definition.command_line(args.benchmark_root, *placement, args.input)
+                for placement in placements}
+except ValueError as e:
+    parser.error(str(e))
+
+avail_big, avail_little = get_avail_freqs(4), get_avail_freqs(0)
+print('Available freqs for big cluster:', avail_big)
+print('Available freqs for LITTLE cluster:', avail_little)
+if args.sweep:
+    big_freqs = args.big_freqs or avail_big
+    little_freqs = args.little_freqs or avail_little
+else:
+    big_freqs, little_freqs = [args.big_freq], [args.little_freq]
+for cluster, freqs, avail in (('big', big_freqs, avail_big), ('little', little_freqs, avail_little)):
+    unknown = sorted(set(freqs) - set(avail))
+    if unknown:
+        parser.error(f"{cluster} cluster frequencies {unknown} are not in {avail}")
+points = [(big, little, placement) for big in big_freqs for little in little_freqs for placement in placements]
+convergence = ConvergenceTracker(args.converge, iterations, args.max_iterations, args.outlier_threshold) \
+    if args.converge is not None else None
+planned = f"up to {len(points) * args.max_iterations}" if convergence is not None else f"{len(points) * iterations}"
+
+
+def iteration_schedule():
+    # Every (frequency point, placement) runs `iterations` iterations, or with --converge
+    # until its confidence intervals are met; iteration numbers run on across them
+    for point in points:
+        if convergence is None:
+            yield from [point] * iterations
+        else:
+            while not convergence.done(point):
+                yield point
+
+
+if len(points) > 1:
+    print(f"Sweeping {len(big_freqs) * len(little_freqs)} frequency points x {len(placements)} placements, "
+          f"{planned} iterations in total")
+
+cooldown_meter = PowerMeterClient("192.168.4.1")
+cooldown = CooldownController(get_temps, lambda: get_idle_power(cooldown_meter),
+                              temp_tolerance=args.temp_tolerance, power_tolerance=args.power_tolerance,
+                              timeout=args.cooldown_timeout)
+
+
+
+# Running statistics of the iteration in progress, for queries while it runs
+stats_server = StatsServer(port=args.stats_port).start() if args.stats_port is not None else None
+
+if args.calibrate is not None:
+    apply_frequency_point(big_freqs[0], little_freqs[0])
+    calibration = calibrate_sampler(f'{logname_base}_calibration', args.calibrate,
+                                    args.calibrate_periods or [period], args.sysfs_groups)
+    with open(f'{logname_base}_calibration.json', 'w') as f:
+        json.dump({'big_freq': big_freqs[0], 'little_freq': little_freqs[0], 'duration': args.calibrate,
+                   'phases': calibration}, f, indent=1)
+    idle = calibration[0]
+    print(f"Meter only: {idle['power']} W, CPU {idle['cpu_percent']:.1f}%")
+    for phase in calibration[1:]:
+        overhead = f"{phase['power_overhead']:+.3f} W" if phase['power_overhead'] is not None else "unknown"
+        print(f"Sampling every {phase['period']:g} s: power {overhead}, CPU {phase['cpu_overhead_percent']:+.1f}%, "
+              f"sampling thread {phase['self_profile']['cpu_share']:.1%} of a core")
+    sys.exit(0)
+
+# Create a socket object
+soc = socket.socket()
+# Set the socket to reuse the address
+soc.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+# Bind the socket to the host and port
+soc.bind((host, port))
+# Samples of every iteration are streamed live to whoever subscribes
+telemetry = TelemetryServer(soc).serve()
+
+previous_point = None
+iterations_run = 0
+for i, (big_freq, little_freq, placement) in enumerate(iteration_schedule()):
+        iterations_run += 1
+        # Defaults: big cluster --> 2 GHz, little cluster --> 0.2 GHz
+        apply_frequency_point(big_freq, little_freq)
 
         # print current freq for the little cluster and big cluster
         print('Current freq for big cluster:', get_cluster_freq(4))
         print('Current freq for little cluster:', get_cluster_freq(0))
-        out_fname = f'{logname_base}_{i}_{benchmark.replace("/", "_")}.txt'
-        print(f"Starting iteration {i} of {iterations}, logging to {out_fname}")
-
+        if args.cooldown == 'adaptive' and (big_freq, little_freq) != previous_point:
+            # Idle baseline the board has to return to between iterations; idle power
+            # depends on the frequencies, so every frequency point gets its own
+            cooldown_meter.start()
+            baseline_temps, baseline_power = cooldown.measure_baseline()
+            cooldown_meter.stop()
+            print(f"Cooldown baseline: temperatures {baseline_temps}, idle power {baseline_power} W")
+        previous_point = (big_freq, little_freq)
+        out_fname = f'{logname_base}_{i}_{benchmark.replace("/", "_")}.{log_ext}'
+        # Flushed so the line lands in results.txt before the benchmark's own output
+        print(f"Starting iteration {i} of {planned} on cores {placement[0]:#x} with {placement[1]} threads, "
+              f"logging to {out_fname}", flush=True)
 
-        # Create a socket object
-        soc = socket.socket()
-        # Set the socket to reuse the address
-        soc.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        # Bind the socket to the host and port
-        soc.bind((host, port))
 
         stop_event = threading.Event()
-        t1 = threading.Thread(target=run_measurement, args=(out_fname, stop_event))
+        stats = StreamingStats()
+        telemetry.info = {'iteration': i, 'benchmark': benchmark, 'big_freq': big_freq, 'little_freq': little_freq,
+                          'affinity': placement[0], 'threads': placement[1]}
+        if stats_server is not None:
+            stats_server.stats = stats
+            stats_server.info = {'iteration': i, 'iterations': planned, 'benchmark': benchmark,
+                                 'big_freq': big_freq, 'little_freq': little_freq, 'affinity': placement[0],
+                                 'threads': placement[1], 'start': None, 'end': None}
+        counters = CounterProbe(backend=args.counters, interval=probe_periods.get('counters', period)) \
+            if args.counters != 'off' else None
+        t1 = threading.Thread(target=measurement_thread, args=(out_fname, stop_event, period, probe_periods,
+                                                                counters, args.sysfs_groups, stats, telemetry))
         t1.start()
         print("Measurement thread started.")
         
-        measurement_started_event.wait()
-        time.sleep(2)  # Adjust delay as needed
-        # run the benchmark
-        start = time.time()
-        if benchmark == "tp":  # TPBench
-            command = "taskset --all-tasks 0x10 /home/student/HW2_files/TPBench.exe"  # 0x10: core 4 (7 6 5 4 3 2 1 0)
-        
-        elif benchmark == "bs":  # blackscholes
-            command = "taskset --all-tasks 0xF0 /home/student/HW2_files/parsec_files/blackscholes 4 /home/student/HW2_files/parsec_files/in_10M_blackscholes.txt out"  # 0xF0: cores 7654, 4 threads
-           
-        elif benchmark == "bt":  # bodytrack
-            command = "taskset --all-tasks 0xF0 /home/student/HW2_files/parsec_files/bodytrack /home/student/HW2_files/parsec_files/sequenceB_261 4 260 3000 8 3 4 0"  # 0xF0: core 7654, 4 threads
-      
-        else:
-            print("Unknown benchmark specified.")
-            sys.exit(1)
-
-        proc_ben = subprocess.Popen(command.split())  # Use Popen to start the subprocess asynchronously
-    # Wait for the benchmark process to finish and measure its runtime
-        proc_ben.wait()
-        # measure the time to run the benchmark
-
-        total_time = time.time() - start
-        print(f"Iteration {i + 1} benchmark runtime: {total_time} seconds")
-        print("Start time: ", start, " End time: ", start + total_time)
-
-        # Log the start and end times to a file
-        time_find = f'{logname_base}_{i}_{benchmark.replace("/", "_")}_time.txt'
-        with open(time_find , 'w') as log_file:
-            log_file.write(f"Start_time: {start}\n")
-            log_file.write(f"End time: {start+total_time}\n")
-
-        time.sleep(2)
-        # Stop the power and temperature recording thread if it's running
-        if stop_event:
+        proc_ben = None
+        try:
+            measurement_started_event.wait()
+            check_measurement()
+            time.sleep(guard)  # Idle guard band before the benchmark
+            # run the benchmark
+            start = wall_time()
+            if stats_server is not None:
+                stats_server.info['start'] = start
+            proc_ben = subprocess.Popen(commands[placement])  # Use Popen to start the subprocess asynchronously
+            if counters is not None:
+                # Threads the benchmark starts from here on are counted as well
+                counters.attach(proc_ben.pid)
+                if counters.reason:
+                    print(f"Hardware counters: using {counters.backend} ({counters.reason})")
+        # Wait for the benchmark process to finish and measure its runtime
+            proc_ben.wait()
+            # measure the time to run the benchmark
+
+            total_time = wall_time() - start
+            if stats_server is not None:
+                stats_server.info['end'] = start + total_time
+            print(f"Iteration {i + 1} benchmark runtime: {total_time} seconds")
+            print("Start time: ", start, " End time: ", start + total_time)
+
+            # Log the start and end times to a file
+            time_find = f'{logname_base}_{i}_{benchmark.replace("/", "_")}_time.txt'
+            with open(time_find , 'w') as log_file:
+                log_file.write(f"Start_time: {start}\n")
+                log_file.write(f"End time: {start+total_time}\n")
+                log_file.write(f"Big_freq: {big_freq}\n")
+                log_file.write(f"Little_freq: {little_freq}\n")
+                log_file.write(f"Affinity: {placement[0]:#x}\n")
+                log_file.write(f"Threads: {placement[1]}\n")
+
+            time.sleep(guard)  # Idle guard band after the benchmark
+        finally:
+            # Also when the benchmark fails to start or the run is interrupted: the
+            # measurement thread is not a daemon and its log header is written on stop
+            if proc_ben is not None and proc_ben.poll() is None:
+                proc_ben.kill()
             stop_event.set()
             t1.join()
             measurement_started_event.clear()
-        # Close the socket
-        soc.close()
+        check_measurement()
+        # Final running statistics of the whole iteration, guard bands included
+        stats.write(f'{logname_base}_{i}_{benchmark.replace("/", "_")}_stats.json',
+                    iteration=i, start=start, end=start + total_time)
+        if convergence is not None:
+            point = (big_freq, little_freq, placement)
+            meter_log, _ = read_samples(os.path.splitext(out_fname)[0] + '_power.bin')
+            energy = window_energy(meter_log['time'], meter_log['power'], start, start + total_time)
+            if convergence.add(point, i, total_time, energy):
+                print(f"Iteration {i} is an outlier (runtime {total_time:.3f} s, energy {energy} J), running another")
+                with open(time_find, 'a') as log_file:
+                    log_file.write("Outlier: 1\n")
+            print(f"Relative 95% confidence intervals: runtime ±{convergence.relative_ci(point, 'runtime'):.2%}, "
+                  f"energy ±{convergence.relative_ci(point, 'energy'):.2%} (target ±{args.converge:.2%})")
+            convergence.write(f'{logname_base}_convergence_{benchmark.replace("/", "_")}.json')
+        if counters is not None:
+            counters.close()
+        telemetry.end(iteration=i, start=start, end=start + total_time)
         print("-" * 50)
-        print(f"Waiting 2 minutes for devices to cool down...")
-        time.sleep(120) # Wait for 2 minutes for devices to cool down
+        print(f"Waiting up to {cooldown.timeout:.0f} s for the device to cool down...")
+        if args.cooldown == 'adaptive':
+            cooldown_meter.start()
+            cooled = cooldown.wait(f'{logname_base}_{i}_{benchmark.replace("/", "_")}_cooldown.txt')
+            cooldown_meter.stop()
+        else:
+            cooled = cooldown.wait()
+        if cooled['settled']:
+            print(f"Cooled down to baseline in {cooled['seconds']:.1f} s")
+        else:
+            print(f"Cooldown ended after {cooled['seconds']:.1f} s (temperatures {cooled['temps']}, power {cooled['power']} W)")
         print(f"Data Processing done")
 
-print("All iterations completed.")
+telemetry.close()
+if stats_server is not None:
+    stats_server.stop()
+if convergence is not None:
+    for point in convergence.summary():
+        state = 'converged' if point['converged'] else 'NOT converged'
+        print(f"Point {point['point']}: {state} after {len(point['iterations'])} iterations, "
+              f"{len(point['outliers'])} outliers re-run")
+print(f"All {iterations_run} iterations completed.")
 
 
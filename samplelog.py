@@ -0,0 +1,171 @@
+# Binary measurement log.
+# A log file starts with a fixed-size header block: an 8 byte magic, the header
+# block length as a little-endian uint32, then a JSON document describing the
+# columns (name and numpy dtype) plus free-form metadata, padded with spaces.
+# Fixed-size little-endian records follow directly after the header block, so a
+# reader can np.memmap the file into a structured array without parsing it.
+# The header block is sized up front so metadata can be rewritten when the log
+# is closed (sample counts, scheduler statistics, ...) without moving records.
+
+import json
+import os
+import numpy as np
+
+MAGIC = b'EDGESMPL'
+VERSION = 1
+HEADER_SIZE = 16384
+
+# Column layout of the run_measurement log
+MEASUREMENT_COLUMNS = [
+    ('time', '<f8'),
+    ('power', '<f4'),
+    ('usage_c0', '<f4'), ('usage_c1', '<f4'), ('usage_c2', '<f4'), ('usage_c3', '<f4'),
+    ('usage_c4', '<f4'), ('usage_c5', '<f4'), ('usage_c6', '<f4'), ('usage_c7', '<f4'),
+    ('temp4', '<f4'), ('temp5', '<f4'), ('temp6', '<f4'), ('temp7', '<f4'),
+    ('little_micro_volts', '<i4'), ('big_micro_volts', '<i4'),
+    ('used_memory', '<i4'), ('free_memory', '<i4'),
+    ('little_core_freq', '<i4'), ('big_core_freq', '<i4'),
+]
+
+
+def _encode_header(columns, meta, header_size):
+    doc = json.dumps({'version': VERSION, 'columns': [list(c) for c in columns], 'meta': meta})
+    body = doc.encode('utf-8')
+    prefix = MAGIC + np.uint32(header_size).tobytes()
+    if len(prefix) + len(body) > header_size:
+        raise ValueError(f"Log header does not fit in {header_size} bytes")
+    return prefix + body.ljust(header_size - len(prefix), b' ')
+
+
+class SampleLogWriter:
+    """
+    Writes fixed-size records through a preallocated in-memory ring buffer.
+    Records are only written to disk when a block of `block_records` records has
+    filled up, and on flush()/close().
+    """
+
+    def __init__(self, fname, columns=MEASUREMENT_COLUMNS, meta=None, block_records=1024,
+                 header_size=HEADER_SIZE):
+        self.fname = fname
+        self.columns = [tuple(c) for c in columns]
+        self.names = [name for name, _ in self.columns]
+        self.meta = dict(meta or {})
+        self.header_size = header_size
+        self.dtype = np.dtype(self.columns)
+        self.count = 0
+        self._ring = np.zeros(block_records, dtype=self.dtype)
+        self._fill = 0
+        self._file = open(fname, 'wb')
+        self._file.write(_encode_header(self.columns, self.meta, header_size))
+
+    def append(self, values):
+        """
+        Store one record. values must be in column order.
+        """
+        self._ring[self._fill] = tuple(values)
+        self._fill += 1
+        self.count += 1
+        if self._fill == len(self._ring):
+            self.flush()
+
+    def flush(self):
+        if self._fill:
+            self._file.write(memoryview(self._ring[:self._fill]).cast('B'))
+            self._fill = 0
+        self._file.flush()
+
+    def update_meta(self, **meta):
+        """
+        Merge metadata into the header. Written to disk on close().
+        """
+        self.meta.update(meta)
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self.meta['samples'] = self.count
+        self._file.seek(0)
+        self._file.write(_encode_header(self.columns, self.meta, self.header_size))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(fname):
+    """
+    Returns (header_size, header dict) of a binary sample log.
+    """
+    with open(fname, 'rb') as f:
+        prefix = f.read(len(MAGIC) + 4)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{fname} is not a binary sample log")
+        header_size = int(np.frombuffer(prefix[len(MAGIC):], dtype='<u4')[0])
+        header = json.loads(f.read(header_size - len(prefix)).decode('utf-8'))
+    return header_size, header
+
+
+def read_samples(fname):
+    """
+    Map a binary sample log into a structured array without copying it.
+    Returns (records, meta). A partially written trailing record is ignored.
+    """
+    header_size, header = read_header(fname)
+    dtype = np.dtype([tuple(c) for c in header['columns']])
+    n = (os.path.getsize(fname) - header_size) // dtype.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=dtype), header['meta']
+    records = np.memmap(fname, dtype=dtype, mode='r', offset=header_size, shape=(n,))
+    return records, header['meta']
+
+
+class TextSampleLogWriter:
+    """
+    Legacy tab separated log with the same interface as SampleLogWriter.
+    Metadata is not stored.
+    """
+
+    def __init__(self, fname, columns=MEASUREMENT_COLUMNS, meta=None):
+        self.fname = fname
+        self.names = [name for name, _ in columns]
+        self.meta = dict(meta or {})
+        self.count = 0
+        self._fmt = "{}\t" * len(self.names) + "\n"
+        self._file = open(fname, 'w')
+        self._file.write("\t".join(self.names))
+        self._file.write("\n")
+
+    def append(self, values):
+        self._file.write(self._fmt.format(*values))
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def update_meta(self, **meta):
+        self.meta.update(meta)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sample_log(fname, columns=MEASUREMENT_COLUMNS, meta=None):
+    """
+    Open a binary log for .bin file names and a text log otherwise.
+    """
+    if fname.endswith('.bin'):
+        return SampleLogWriter(fname, columns, meta)
+    return TextSampleLogWriter(fname, columns, meta)
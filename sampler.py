@@ -0,0 +1,275 @@
+# Low overhead sysfs sampler for the measurement thread.
+# Every node is opened once when the sampler is created and kept open for the
+# whole run. Each tick re-reads the nodes with a positional read (offset 0) into
+# a buffer allocated up front, so a sample costs one syscall per node and no
+# path formatting, open/close or file object churn.
+# Nodes come in groups (temperatures, voltages, frequencies, GPU, throttling);
+# the log columns follow from the groups that are enabled and the nodes the
+# board actually has.
+
+import os
+import time
+import sysfs_paths as sysfs
+
+
+NODE_GROUPS = ('temps', 'volts', 'cluster_freq', 'core_freq', 'gpu', 'throttle')
+
+
+def _indices(path_format, limit=32):
+    # Numbers of the existing sysfs directories like thermal_zone{} or cooling_device{}
+    return [i for i in range(limit) if os.path.exists(path_format.format(i))]
+
+
+def _read_text(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def thermal_zone_types():
+    """
+    {zone number: type} of the thermal zones, read once (types do not change).
+    """
+    return {i: _read_text(sysfs.fn_thermal_type.format(i)) for i in _indices(sysfs.fn_thermal_base)}
+
+
+def cooling_device_types():
+    """
+    {device number: type} of the thermal cooling devices (cpufreq or fan throttling).
+    """
+    return {i: _read_text(sysfs.fn_cooling_type.format(i)) for i in _indices(sysfs.fn_cooling_base)}
+
+
+def default_nodes(groups=('temps', 'volts', 'cluster_freq')):
+    """
+    Nodes read by run_measurement on every tick, as (column, path, divisor) tuples.
+    A divisor of None keeps the raw integer value. groups selects from NODE_GROUPS;
+    the default is the original measurement log layout.
+    """
+    unknown = set(groups) - set(NODE_GROUPS)
+    if unknown:
+        raise ValueError(f"Unknown sysfs node groups: {sorted(unknown)}")
+    nodes = []
+    if 'temps' in groups:
+        # Big core temperatures from thermal zones 0-3. On the Exynos5422 zones 1 and 3
+        # (cores 5 and 7) report each other's value, so they are swapped back here.
+        nodes += [
+            ('temp4', sysfs.fn_thermal_sensor.format(0), 1000),
+            ('temp5', sysfs.fn_thermal_sensor.format(3), 1000),
+            ('temp6', sysfs.fn_thermal_sensor.format(2), 1000),
+            ('temp7', sysfs.fn_thermal_sensor.format(1), 1000),
+        ]
+    if 'volts' in groups:
+        nodes += [
+            ('little_micro_volts', sysfs.little_micro_volts, None),
+            ('big_micro_volts', sysfs.big_micro_volts, None),
+        ]
+    if 'cluster_freq' in groups:
+        nodes += [
+            ('little_core_freq', sysfs.fn_cluster_freq_read.format(0), None),
+            ('big_core_freq', sysfs.fn_cluster_freq_read.format(4), None),
+        ]
+    if 'core_freq' in groups:
+        nodes += [(f'core_freq_c{c}', sysfs.fn_cpu_freq_read.format(c), None) for c in range(8)]
+    if 'gpu' in groups:
+        # GPU temperature (thermal zone 4), clock and rail, plus the memory rail
+        nodes += [
+            ('temp_gpu', sysfs.fn_thermal_sensor.format(4), 1000),
+            ('gpu_freq', sysfs.gpu_freq, None),
+            ('gpu_micro_volts', sysfs.gpu_micro_volts, None),
+            ('mem_micro_volts', sysfs.mem_micro_volts, None),
+        ]
+    if 'throttle' in groups:
+        # Thermal throttling lowers the policy's scaling_max_freq and raises the
+        # cooling devices' cur_state above 0
+        nodes += [
+            ('little_max_freq', sysfs.fn_cluster_max_set.format(0), None),
+            ('big_max_freq', sysfs.fn_cluster_max_set.format(4), None),
+        ]
+        nodes += [(f'cooling_state_{i}', sysfs.fn_cooling_cur_state.format(i), None)
+                  for i in _indices(sysfs.fn_cooling_base)]
+    return nodes
+
+
+class SysfsSampler:
+    """
+    Holds an open descriptor and a preallocated read buffer for every sysfs node.
+    sample() refreshes all values in place and returns the same list every call.
+    With skip_missing, nodes the board does not have are left out (and listed in
+    `missing`) instead of failing.
+    """
+    BUF_SIZE = 64  # sysfs value nodes are a single short line
+
+    def __init__(self, nodes=None, skip_missing=False):
+        self._probes = []
+        self.missing = []
+        nodes = list(nodes) if nodes is not None else default_nodes()
+        self.nodes = []
+        try:
+            for name, path, divisor in nodes:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    if not skip_missing:
+                        raise
+                    self.missing.append(name)
+                    continue
+                self._probes.append((fd, bytearray(self.BUF_SIZE), divisor))
+                self.nodes.append((name, path, divisor))
+        except OSError:
+            self.close()
+            raise
+        self.names = [name for name, _, _ in self.nodes]
+        self.values = [0] * len(self.nodes)
+
+    @property
+    def columns(self):
+        """
+        Log columns of the nodes: scaled values as float32, raw integers as int32.
+        """
+        return [(name, '<f4' if divisor else '<i4') for name, _, divisor in self.nodes]
+
+    def close(self):
+        for fd, _, _ in self._probes:
+            os.close(fd)
+        self._probes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def sample(self):
+        """
+        Re-read every node. Returns self.values, updated in place in column order.
+        """
+        values = self.values
+        for i, (fd, buf, divisor) in enumerate(self._probes):
+            n = _pread_into(fd, buf)
+            value = int(buf[:n])
+            values[i] = value / divisor if divisor else value
+        return values
+
+    def read(self, name):
+        """
+        Re-read a single node by column name.
+        """
+        i = self.names.index(name)
+        fd, buf, divisor = self._probes[i]
+        n = _pread_into(fd, buf)
+        value = int(buf[:n])
+        return value / divisor if divisor else value
+
+
+if hasattr(os, 'preadv'):
+    def _pread_into(fd, buf):
+        return os.preadv(fd, [buf], 0)
+else:
+    def _pread_into(fd, buf):
+        data = os.pread(fd, len(buf), 0)
+        buf[:len(data)] = data
+        return len(data)
+
+
+class MeminfoProbe:
+    """
+    Memory probe that parses /proc/meminfo from a descriptor kept open for the run,
+    replacing a `free -m` fork per tick. Values are reported in MB like `free -m`.
+
+    budget_us bounds the average per-tick cost: when a read takes longer than the
+    budget the probe reuses its previous values for as many ticks as it overran by.
+    """
+    FIELDS = ('used_memory', 'free_memory', 'available_memory', 'buffers_memory',
+              'cached_memory', 'swap_used_memory', 'swap_free_memory')
+    BUF_SIZE = 4096
+    MAX_SKIP = 10
+
+    _KEYS = (b'MemTotal', b'MemFree', b'MemAvailable', b'Buffers', b'Cached',
+             b'SReclaimable', b'SwapTotal', b'SwapFree')
+
+    def __init__(self, fields=('used_memory', 'free_memory'), budget_us=500, path='/proc/meminfo'):
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown meminfo fields: {sorted(unknown)}")
+        self.names = list(fields)
+        self.values = [0] * len(self.names)
+        self.budget_ns = int(budget_us * 1000)
+        self.ticks = 0
+        self.over_budget = 0
+        self.last_cost_ns = 0
+        self._skip = 0
+        self._kb = dict.fromkeys(self._KEYS, 0)
+        self._buf = bytearray(self.BUF_SIZE)
+        self._fd = os.open(path, os.O_RDONLY)
+
+    @property
+    def columns(self):
+        return [(name, '<i4') for name in self.names]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sample(self):
+        """
+        Refresh the selected fields. Returns self.values, updated in place.
+        """
+        self.ticks += 1
+        if self._skip:
+            self._skip -= 1
+            return self.values
+
+        t0 = time.perf_counter_ns()
+        n = _pread_into(self._fd, self._buf)
+        kb = self._kb
+        remaining = len(kb)
+        for line in bytes(self._buf[:n]).split(b'\n'):
+            key, _, rest = line.partition(b':')
+            if key in kb:
+                kb[key] = int(rest.rstrip(b' kB'))
+                remaining -= 1
+                if not remaining:
+                    break
+        derived = self._derive(kb)
+        values = self.values
+        for i, name in enumerate(self.names):
+            values[i] = derived[name]
+
+        self.last_cost_ns = time.perf_counter_ns() - t0
+        if self.last_cost_ns > self.budget_ns:
+            self.over_budget += 1
+            self._skip = min(self.last_cost_ns // self.budget_ns, self.MAX_SKIP)
+        return values
+
+    @staticmethod
+    def _derive(kb):
+        # Same definitions as procps 3.3 `free` on the boards: cache includes
+        # reclaimable slab, and used is whatever is not free, buffers or cache.
+        total = kb[b'MemTotal']
+        free = kb[b'MemFree']
+        buffers = kb[b'Buffers']
+        cached = kb[b'Cached'] + kb[b'SReclaimable']
+        used = total - free - buffers - cached
+        if used < 0:
+            used = total - free
+        # MemAvailable is missing on kernels older than 3.14
+        available = kb[b'MemAvailable'] or free + buffers + cached
+        return {
+            'used_memory': used // 1024,
+            'free_memory': free // 1024,
+            'available_memory': available // 1024,
+            'buffers_memory': buffers // 1024,
+            'cached_memory': cached // 1024,
+            'swap_used_memory': (kb[b'SwapTotal'] - kb[b'SwapFree']) // 1024,
+            'swap_free_memory': kb[b'SwapFree'] // 1024,
+        }
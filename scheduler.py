@@ -0,0 +1,195 @@
+# Deadline based sampling scheduler.
+# Probes run on absolute deadlines derived from time.monotonic_ns, so sleep
+# overshoot does not accumulate into drift and wall-clock adjustments (NTP, RTC
+# sync after boot) cannot produce bogus intervals. Every probe has its own period;
+# when a probe falls behind it skips the deadlines it missed instead of running
+# in a burst, and the skipped deadlines are counted.
+# With profile=True every probe run is also timed (wall and thread CPU time),
+# so the sampler's own cost shows up next to its period statistics. The change in
+# live memory blocks across each run is kept too. It is a net count, not the
+# number of allocations: a probe that frees all it allocates shows 0, and runs
+# that trigger a garbage collection can show negative values. CPython has no
+# cheap allocation counter, and tracemalloc would slow down every thread of the
+# process the profile is meant to describe.
+
+import sys
+import time
+from bisect import bisect_right
+
+# Wall-clock time of the monotonic clock's zero point, taken once at import.
+# wall_time() follows the monotonic clock from there, so timestamps stay evenly
+# spaced even if the system clock is stepped while a run is in progress.
+_WALL0 = time.time()
+_MONO0 = time.monotonic_ns()
+
+
+def wall_time():
+    """
+    Wall-clock seconds that advance with the monotonic clock.
+    """
+    return _WALL0 + (time.monotonic_ns() - _MONO0) / 1e9
+
+
+class Probe:
+    """
+    A function run every `period_ns` with achieved-period statistics.
+    Histogram bins are relative to the nominal period (see RATIO_EDGES); the
+    run time histograms of a profiled probe are in microseconds (DURATION_EDGES_US).
+    """
+    RATIO_EDGES = (0.5, 0.9, 0.99, 1.01, 1.1, 1.5, 2.0, 5.0)
+    DURATION_EDGES_US = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+    def __init__(self, name, period_ns, fn, profile=False):
+        self.name = name
+        self.period_ns = period_ns
+        self.fn = fn
+        self.next_deadline = 0
+        self.last_run = None
+        self.runs = 0
+        self.missed = 0
+        self.max_period_ns = 0
+        self.hist = [0] * (len(self.RATIO_EDGES) + 1)
+        self._edges_ns = [r * period_ns for r in self.RATIO_EDGES]
+        self.profile = profile
+        self._duration_edges_ns = [us * 1000 for us in self.DURATION_EDGES_US]
+        self.wall_ns = 0
+        self.max_wall_ns = 0
+        self.wall_hist = [0] * (len(self.DURATION_EDGES_US) + 1)
+        self.cpu_ns = 0
+        self.max_cpu_ns = 0
+        self.cpu_hist = [0] * (len(self.DURATION_EDGES_US) + 1)
+        self.net_live_blocks = 0
+        self.max_net_live_blocks = 0
+
+    def _profiled(self):
+        blocks = sys.getallocatedblocks()
+        cpu = time.thread_time_ns()
+        start = time.monotonic_ns()
+        self.fn()
+        wall = time.monotonic_ns() - start
+        cpu = time.thread_time_ns() - cpu
+        blocks = sys.getallocatedblocks() - blocks
+        self.wall_ns += wall
+        self.max_wall_ns = max(self.max_wall_ns, wall)
+        self.wall_hist[bisect_right(self._duration_edges_ns, wall)] += 1
+        self.cpu_ns += cpu
+        self.max_cpu_ns = max(self.max_cpu_ns, cpu)
+        self.cpu_hist[bisect_right(self._duration_edges_ns, cpu)] += 1
+        self.net_live_blocks += blocks
+        self.max_net_live_blocks = max(self.max_net_live_blocks, blocks)
+
+    def run(self, now):
+        if self.profile:
+            self._profiled()
+        else:
+            self.fn()
+        self.runs += 1
+        if self.last_run is not None:
+            achieved = now - self.last_run
+            if achieved > self.max_period_ns:
+                self.max_period_ns = achieved
+            b = 0
+            for edge in self._edges_ns:
+                if achieved < edge:
+                    break
+                b += 1
+            self.hist[b] += 1
+        self.last_run = now
+
+        self.next_deadline += self.period_ns
+        if self.next_deadline <= now:
+            late = (now - self.next_deadline) // self.period_ns + 1
+            self.missed += late
+            self.next_deadline += late * self.period_ns
+
+    def stats(self):
+        stats = {
+            'period_s': self.period_ns / 1e9,
+            'runs': self.runs,
+            'missed_deadlines': self.missed,
+            'max_period_s': self.max_period_ns / 1e9,
+            'hist_ratio_edges': list(self.RATIO_EDGES),
+            'hist_counts': list(self.hist),
+        }
+        if self.profile:
+            runs = max(self.runs, 1)
+            stats.update({
+                'mean_wall_us': self.wall_ns / runs / 1000,
+                'max_wall_us': self.max_wall_ns / 1000,
+                'mean_cpu_us': self.cpu_ns / runs / 1000,
+                'max_cpu_us': self.max_cpu_ns / 1000,
+                'cpu_s': self.cpu_ns / 1e9,
+                'hist_duration_edges_us': list(self.DURATION_EDGES_US),
+                'hist_wall_counts': list(self.wall_hist),
+                'hist_cpu_counts': list(self.cpu_hist),
+                # Change in live memory blocks over the runs, not an allocation count;
+                # steady growth means the probe retains memory
+                'net_live_blocks': self.net_live_blocks,
+                'max_net_live_blocks': self.max_net_live_blocks,
+            })
+        return stats
+
+
+class DeadlineScheduler:
+    """
+    Runs registered probes on their own periods until stop_event is set.
+    Probes that are due on the same wake-up run in registration order.
+    profile=True times every probe run (see Probe) and the thread as a whole.
+    """
+
+    def __init__(self, clock=time.monotonic_ns, sleep=time.sleep, profile=False):
+        self.clock = clock
+        self.sleep = sleep
+        self.profile = profile
+        self.probes = []
+        self.elapsed_ns = 0
+        self.thread_cpu_ns = 0
+
+    def add(self, name, period, fn):
+        """
+        Run fn() every `period` seconds. Periods down to 1 ms are supported.
+        """
+        if period <= 0:
+            raise ValueError(f"Probe {name} needs a positive period, got {period}")
+        probe = Probe(name, int(period * 1e9), fn, self.profile)
+        self.probes.append(probe)
+        return probe
+
+    def run(self, stop_event):
+        clock = self.clock
+        probes = self.probes
+        start = clock()
+        cpu = time.thread_time_ns()
+        for p in probes:
+            p.next_deadline = start
+        while not stop_event.is_set():
+            now = clock()
+            for p in probes:
+                if now >= p.next_deadline:
+                    p.run(now)
+            wake = min(p.next_deadline for p in probes)
+            delay = wake - clock()
+            if delay > 0:
+                self.sleep(delay / 1e9)
+        self.elapsed_ns = clock() - start
+        self.thread_cpu_ns = time.thread_time_ns() - cpu
+
+    def stats(self):
+        """
+        Per-probe period histograms and missed deadline counts, JSON serialisable.
+        """
+        return {p.name: p.stats() for p in self.probes}
+
+    def profile_stats(self):
+        """
+        CPU time of the sampling thread over its run, split into the probes and
+        the scheduling loop around them, and the share of one core it used.
+        """
+        probe_cpu_ns = sum(p.cpu_ns for p in self.probes)
+        return {
+            'elapsed_s': self.elapsed_ns / 1e9,
+            'thread_cpu_s': self.thread_cpu_ns / 1e9,
+            'probe_cpu_s': probe_cpu_ns / 1e9 if self.profile else None,
+            'loop_cpu_s': (self.thread_cpu_ns - probe_cpu_ns) / 1e9 if self.profile else None,
+            'cpu_share': self.thread_cpu_ns / self.elapsed_ns if self.elapsed_ns else None,
+        }
@@ -0,0 +1,258 @@
+# Constant-memory statistics kept by the measurement thread while it runs.
+# Every logged record updates a Welford mean/variance, the min/max and P²
+# estimates of a few quantiles per tracked column, and the trapezoidal running
+# energy, so the numbers DataProcessing.py computes after the run are available
+# (approximately) at any moment of it. StatsServer answers HTTP GETs on a local
+# port with the current snapshot as JSON:
+#   curl http://127.0.0.1:9021/
+# and write() leaves the final snapshot next to the measurement log.
+
+import fnmatch
+import json
+import math
+import threading
+import time
+from bisect import bisect_right, insort
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Log columns tracked by default: power, temperatures, core usage and memory
+TRACKED_COLUMNS = ('power', 'temp*', 'usage_c*', '*_memory')
+QUANTILES = (0.5, 0.95)
+
+# Two-sided 95% Student t quantiles by degrees of freedom; 1.96 beyond the table
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+        10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+        18: 2.101, 19: 2.093, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def t_quantile(dof):
+    """
+    Two-sided 95% Student t quantile for dof degrees of freedom (conservatively
+    rounded down to the nearest tabulated dof).
+    """
+    if dof < 1:
+        return math.nan
+    return T_95[max(d for d in T_95 if d <= dof)] if dof <= max(T_95) else 1.96
+
+
+class Welford:
+    """
+    Running count, mean, variance, min and max; NaN values are skipped.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x):
+        if x != x:
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def ci95(self):
+        """
+        Half-width of the 95% confidence interval of the mean, treating the
+        samples as independent.
+        """
+        return t_quantile(self.count - 1) * self.std / math.sqrt(self.count) if self.count > 1 else math.nan
+
+
+class P2Quantile:
+    """
+    P² estimate of the p-quantile (Jain and Chlamtac, 1985): five markers whose
+    heights are adjusted with piecewise-parabolic interpolation as samples arrive.
+    Exact for the first five samples.
+    """
+    __slots__ = ('p', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x):
+        if x != x:
+            return
+        q, n = self.heights, self.positions
+        if len(q) < 5:
+            insort(q, x)
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    # Parabola overshoots a neighbour; fall back to linear
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    @property
+    def value(self):
+        q = self.heights
+        if not q:
+            return math.nan
+        if len(q) < 5:
+            return q[int(round(self.p * (len(q) - 1)))]
+        return q[2]
+
+
+class StreamingStats:
+    """
+    Accumulators for the log columns matching the patterns in tracked, plus the
+    running energy of the 'power' column. bind() the log's column names before
+    the first update(record); update() and snapshot() may run in different threads.
+    """
+
+    def __init__(self, tracked=TRACKED_COLUMNS, quantiles=QUANTILES):
+        self.tracked = tracked
+        self.quantiles = quantiles
+        self.names = []
+        self._indices = []
+        self._moments = []
+        self._estimators = []
+        self._power_idx = None
+        self._lock = threading.Lock()
+        self.records = 0
+        self.first_time = None
+        self.last_time = None
+        self.energy = 0.0
+        self._last_power = math.nan
+
+    def bind(self, names):
+        self.names = [name for name in names if any(fnmatch.fnmatchcase(name, p) for p in self.tracked)]
+        self._indices = [list(names).index(name) for name in self.names]
+        self._moments = [Welford() for _ in self.names]
+        self._estimators = [[P2Quantile(p) for p in self.quantiles] for _ in self.names]
+        self._power_idx = list(names).index('power') if 'power' in names else None
+        return self
+
+    def update(self, record):
+        """
+        Add one log record (a sequence in log column order, timestamp first).
+        """
+        t = record[0]
+        with self._lock:
+            for idx, moments, estimators in zip(self._indices, self._moments, self._estimators):
+                x = float(record[idx])
+                moments.update(x)
+                for estimator in estimators:
+                    estimator.update(x)
+            if self._power_idx is not None:
+                power = float(record[self._power_idx])
+                if self.last_time is not None and power == power and self._last_power == self._last_power:
+                    self.energy += 0.5 * (power + self._last_power) * (t - self.last_time)
+                self._last_power = power
+            if self.first_time is None:
+                self.first_time = t
+            self.last_time = t
+            self.records += 1
+
+    def snapshot(self):
+        """
+        Current statistics as a JSON-serialisable dict; NaN and infinities become None.
+        """
+        def number(x):
+            return x if math.isfinite(x) else None
+
+        with self._lock:
+            columns = {}
+            for name, moments, estimators in zip(self.names, self._moments, self._estimators):
+                columns[name] = {
+                    'count': moments.count,
+                    'mean': number(moments.mean) if moments.count else None,
+                    'std': number(moments.std),
+                    'ci95': number(moments.ci95),
+                    'min': number(moments.min),
+                    'max': number(moments.max),
+                    **{f'p{round(e.p * 100):g}': number(e.value) for e in estimators},
+                }
+            elapsed = self.last_time - self.first_time if self.records else 0.0
+            return {
+                'time': time.time(),
+                'records': self.records,
+                'first_time': self.first_time,
+                'last_time': self.last_time,
+                'elapsed': elapsed,
+                'energy': self.energy,
+                'avg_power': self.energy / elapsed if elapsed > 0 else None,
+                'columns': columns,
+            }
+
+    def write(self, fname, **extra):
+        """
+        Write the snapshot (plus any extra fields) as a JSON summary file.
+        """
+        with open(fname, 'w') as f:
+            json.dump({**extra, **self.snapshot()}, f, indent=1)
+
+
+class StatsServer:
+    """
+    Serves the snapshot of `stats` (a StreamingStats, or None between iterations)
+    plus the fields in `info` as JSON to HTTP GETs on host:port, from a daemon thread.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9021):
+        self.stats = None
+        self.info = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                snapshot = server.stats.snapshot() if server.stats is not None else None
+                body = json.dumps({**server.info, 'stats': snapshot}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stats-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
@@ -46,6 +46,12 @@ fn_thermal_base = "/sys/devices/virtual/thermal/thermal_zone{}/"
 fn_thermal_sensor = fn_thermal_base+"temp"
 fn_thermal_type = fn_thermal_base+"type"
 
+# Thermal cooling devices (cpufreq clamping); cur_state > 0 means throttling
+fn_cooling_base = "/sys/class/thermal/cooling_device{}/"
+fn_cooling_cur_state = fn_cooling_base+"cur_state"
+fn_cooling_max_state = fn_cooling_base+"max_state"
+fn_cooling_type = fn_cooling_base+"type"
+
 # For voltages:
 little_cluster_voltage_base = "/sys/devices/platform/pwrseq/subsystem/devices/s2mps11-regulator/regulator/regulator.44/"
 little_micro_volts = little_cluster_voltage_base+"microvolts"
@@ -71,4 +77,4 @@ gpu_micro_volts  =  gpu_voltage_base + 'microvolts'
 # mem_freq_base  =  "/sys/class/devfreq/exynos5-devfreq-mif/"
 # mem_freq  =  mem_freq_base + 
 mem_voltage_base = "/sys/devices/platform/pwrseq/subsystem/devices/s2mps11-regulator/regulator/regulator.43/"
-mem_micro_volts  =  gpu_voltage_base + 'microvolts'
+mem_micro_volts  =  mem_voltage_base + 'microvolts'
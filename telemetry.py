@@ -0,0 +1,295 @@
+# Live telemetry of the measurement log over TCP.
+# run_benchmark.py listens on --host/--port for the whole run and streams every
+# logged record to the connected subscribers, so a dashboard can watch power
+# and thermals of many boards without pulling and re-parsing log files.
+#
+# A subscriber connects and sends one line, "ndjson" or "binary" (ndjson if it
+# sends nothing). It then receives the header of the current iteration (column
+# names and types, iteration number and operating point), the records still in
+# the replay buffer, and from then on every batch of new records:
+#   ndjson  - one JSON object per line: {"type": "header"|"samples"|"dropped"|"end", ...};
+#             samples carry "rows" in column order, NaN as null
+#   binary  - frames of a 1-byte kind and 4-byte payload length (little endian),
+#             kinds FRAME_HEADER/FRAME_DROPPED/FRAME_END with a JSON payload and
+#             FRAME_SAMPLES whose payload is the packed records (numpy dtype of the header)
+# Every subscriber has a bounded queue of frames. When a subscriber falls
+# behind, its oldest frames are dropped and it is told how many records it
+# missed; the measurement thread never waits for the network.
+#
+# python telemetry.py --host <board> --port 10001 prints the stream of a board.
+
+import argparse
+import json
+import math
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+FRAME_HEADER, FRAME_SAMPLES, FRAME_DROPPED, FRAME_END = 0, 1, 2, 3
+_FRAME = struct.Struct('<BI')
+_FORMATS = ('ndjson', 'binary')
+
+
+def _json_value(x):
+    if isinstance(x, np.generic):
+        x = x.item()
+    return None if isinstance(x, float) and not math.isfinite(x) else x
+
+
+class _Subscriber:
+    """
+    One connection with its frame queue and sender thread.
+    """
+
+    def __init__(self, conn, address, fmt, max_pending):
+        self.conn = conn
+        self.address = address
+        self.format = fmt
+        self.frames = deque()
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._send, name=f"telemetry-{address[0]}:{address[1]}", daemon=True)
+
+    def push(self, frame, records=0):
+        with self._cond:
+            if len(self.frames) >= self.max_pending:
+                # Fell behind: drop the oldest frame instead of blocking the measurement
+                self.dropped += self.frames.popleft()[1]
+            self.frames.append((frame, records))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def _send(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self.frames and not self.closed:
+                        self._cond.wait()
+                    if not self.frames:
+                        break
+                    frame, _ = self.frames.popleft()
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    self.conn.sendall(TelemetryServer.encode(self.format, FRAME_DROPPED, {'records': dropped}))
+                self.conn.sendall(frame)
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+            self.conn.close()
+
+
+class TelemetryServer:
+    """
+    Streams log records to TCP subscribers. sock is a bound socket; serve()
+    starts accepting. begin() announces a new log (one per iteration), with the
+    fields of `info` in its header, and resets the replay buffer; publish() adds
+    a record and end() flushes and marks the end of the log. Records are sent in batches of batch_records or every
+    batch_interval seconds, whichever comes first; the last `replay` records
+    are replayed to subscribers that join late.
+    """
+
+    def __init__(self, sock, batch_records=50, batch_interval=0.5, replay=3000, max_pending=256,
+                 hello_timeout=1.0, clock=time.monotonic):
+        self.sock = sock
+        self.batch_records = batch_records
+        self.batch_interval = batch_interval
+        self.max_pending = max_pending
+        self.hello_timeout = hello_timeout
+        self.clock = clock
+        self.replay = deque(maxlen=replay)
+        self.subscribers = []
+        self.info = {}
+        self.header = None
+        self.dtype = None
+        self._batch = []
+        self._batch_started = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def encode(fmt, kind, payload):
+        """
+        One frame: payload is a dict for header/dropped/end frames and a list of
+        records (sequences) or packed record bytes for sample frames.
+        """
+        if fmt == 'ndjson':
+            if kind == FRAME_SAMPLES:
+                payload = {'rows': [[_json_value(x) for x in row] for row in payload]}
+            kind_name = ('header', 'samples', 'dropped', 'end')[kind]
+            return (json.dumps({'type': kind_name, **payload}) + '\n').encode()
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        return _FRAME.pack(kind, len(data)) + data
+
+    def _frames(self, kind, payload):
+        # Each frame is encoded once per format in use, not once per subscriber
+        formats = {s.format for s in self.subscribers}
+        if kind == FRAME_SAMPLES and 'binary' in formats:
+            packed = np.array([tuple(row) for row in payload], dtype=self.dtype).tobytes()
+            return {fmt: self.encode(fmt, kind, packed if fmt == 'binary' else payload) for fmt in formats}
+        return {fmt: self.encode(fmt, kind, payload) for fmt in formats}
+
+    def _broadcast(self, kind, payload, records=0):
+        self.subscribers = [s for s in self.subscribers if not s.closed]
+        if not self.subscribers:
+            return
+        frames = self._frames(kind, payload)
+        for subscriber in self.subscribers:
+            subscriber.push(frames[subscriber.format], records)
+
+    def serve(self):
+        self.sock.listen()
+        self._thread = threading.Thread(target=self._accept, name="telemetry-accept", daemon=True)
+        self._thread.start()
+        return self
+
+    def _accept(self):
+        while True:
+            try:
+                conn, address = self.sock.accept()
+            except OSError:
+                return  # socket closed
+            threading.Thread(target=self._join, args=(conn, address), daemon=True).start()
+
+    def _join(self, conn, address):
+        # The subscriber names its format on the first line; ndjson if it stays silent
+        conn.settimeout(self.hello_timeout)
+        try:
+            hello = conn.recv(64).decode(errors='replace').strip().lower()
+        except socket.timeout:
+            hello = ''
+        except OSError:
+            conn.close()
+            return
+        conn.settimeout(None)
+        fmt = hello if hello in _FORMATS else 'ndjson'
+        subscriber = _Subscriber(conn, address, fmt, self.max_pending)
+        with self._lock:
+            if self.header is not None:
+                subscriber.push(self.encode(fmt, FRAME_HEADER, self.header))
+                replay = list(self.replay)
+                for i in range(0, len(replay), self.batch_records):
+                    rows = replay[i:i + self.batch_records]
+                    payload = np.array(rows, dtype=self.dtype).tobytes() if fmt == 'binary' else rows
+                    subscriber.push(self.encode(fmt, FRAME_SAMPLES, payload), len(rows))
+            self.subscribers.append(subscriber)
+        subscriber._thread.start()
+
+    def begin(self, columns, **info):
+        """
+        Start a new log with the given (name, dtype) columns; self.info and info
+        (iteration, operating point...) go into the header frame.
+        """
+        with self._lock:
+            self._flush()
+            self.dtype = np.dtype([tuple(c) for c in columns])
+            self.header = {'columns': [list(c) for c in columns], **self.info, **info}
+            self.replay.clear()
+            self._broadcast(FRAME_HEADER, self.header)
+
+    def publish(self, record):
+        """
+        Add one record (copied, so the caller may reuse its list).
+        """
+        row = tuple(record)
+        with self._lock:
+            if not self._batch:
+                self._batch_started = self.clock()
+            self._batch.append(row)
+            if len(self._batch) >= self.batch_records or self.clock() - self._batch_started >= self.batch_interval:
+                self._flush()
+
+    def _flush(self):
+        # Only sent records are replayed; late joiners get the pending batch with everyone else
+        if self._batch:
+            self._broadcast(FRAME_SAMPLES, self._batch, len(self._batch))
+            self.replay.extend(self._batch)
+            self._batch = []
+
+    def end(self, **info):
+        """
+        Flush the pending records and tell subscribers the log is complete.
+        """
+        with self._lock:
+            self._flush()
+            self._broadcast(FRAME_END, info)
+
+    def close(self):
+        self.sock.close()
+        with self._lock:
+            for subscriber in self.subscribers:
+                subscriber.close()
+            for subscriber in self.subscribers:
+                subscriber._thread.join(timeout=5)
+            self.subscribers = []
+
+
+def subscribe(host, port, fmt='ndjson'):
+    """
+    Yield (kind, payload) for every frame a telemetry server sends: dicts for
+    header/dropped/end frames, lists of rows (ndjson) or structured arrays
+    (binary) for sample frames.
+    """
+    kinds = {'header': FRAME_HEADER, 'samples': FRAME_SAMPLES, 'dropped': FRAME_DROPPED, 'end': FRAME_END}
+    with socket.create_connection((host, port)) as conn:
+        conn.sendall(f'{fmt}\n'.encode())
+        stream = conn.makefile('rb')
+        dtype = None
+        while True:
+            if fmt == 'ndjson':
+                line = stream.readline()
+                if not line:
+                    return
+                message = json.loads(line)
+                kind = kinds[message.pop('type')]
+                yield kind, (message['rows'] if kind == FRAME_SAMPLES else message)
+                continue
+            head = stream.read(_FRAME.size)
+            if len(head) < _FRAME.size:
+                return
+            kind, length = _FRAME.unpack(head)
+            data = stream.read(length)
+            if kind == FRAME_SAMPLES:
+                yield kind, np.frombuffer(data, dtype=dtype)
+                continue
+            message = json.loads(data)
+            if kind == FRAME_HEADER:
+                dtype = np.dtype([tuple(c) for c in message['columns']])
+            yield kind, message
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the live telemetry of a board running run_benchmark.py')
+    parser.add_argument('--host', default='127.0.0.1', help='board address')
+    parser.add_argument('--port', type=int, default=10001, help='run_benchmark.py --port')
+    parser.add_argument('--binary', action='store_true', help='request binary frames instead of ndjson')
+    parser.add_argument('--columns', nargs='+', default=['time', 'power', 'temp4', 'temp5', 'temp6', 'temp7'],
+                        help='columns to print')
+    args = parser.parse_args()
+
+    names = []
+    for kind, payload in subscribe(args.host, args.port, 'binary' if args.binary else 'ndjson'):
+        if kind == FRAME_HEADER:
+            names = [name for name, _ in payload['columns']]
+            print(f"# iteration {payload.get('iteration')}: " + '\t'.join(c for c in args.columns if c in names))
+        elif kind == FRAME_SAMPLES:
+            for row in payload:
+                print('\t'.join(str(row[names.index(c)]) for c in args.columns if c in names))
+        elif kind == FRAME_DROPPED:
+            print(f"# {payload['records']} records dropped")
+        elif kind == FRAME_END:
+            print(f"# end of iteration {payload.get('iteration')}")
+
+
+if __name__ == "__main__":
+    main()